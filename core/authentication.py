@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def auth_cache_config():
+    config = {'ALIAS': 'default', 'TIMEOUT': 60}
+    config.update(getattr(settings, 'AUTH_CACHE', {}))
+    return config
+
+
+def get_auth_cache():
+    return caches[auth_cache_config()['ALIAS']]
+
+
+def user_cache_key(user_id):
+    return f'core:auth:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    get_auth_cache().delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the token's user in a short-lived cache
+    (settings.AUTH_CACHE) instead of loading it on every request.
+
+    Entries are dropped when the user, its groups or its permissions change
+    (core.signals.handlers); the TTL bounds staleness across processes when
+    the cache is local memory. The active and password-change checks still
+    run on every request.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        cache = get_auth_cache()
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, auth_cache_config()['TIMEOUT'])
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
@@ -0,0 +1,90 @@
+import glob
+import json
+import os
+import pstats
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.middleware import profiling_config
+
+
+SORT_KEYS = {'tottime': 2, 'cumtime': 3}
+
+
+class Command(BaseCommand):
+    help = 'Aggregate traces written by RequestProfilingMiddleware into per-view hot-function reports.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', help='Trace directory, defaults to REQUEST_PROFILING["DIRECTORY"].')
+        parser.add_argument('--view', help='Only report this view, e.g. ProductViewSet.list.')
+        parser.add_argument('--limit', type=int, default=15, help='Functions and statements shown per view.')
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='tottime')
+        parser.add_argument('--clear', action='store_true', help='Delete the traces after reporting.')
+
+    def handle(self, *args, **options):
+        directory = options['directory'] or str(profiling_config()['DIRECTORY'])
+        if not os.path.isdir(directory):
+            raise CommandError(f'No traces in {directory}.')
+
+        views = defaultdict(list)
+        for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            with open(path, encoding='utf-8') as stream:
+                meta = json.load(stream)
+            view = meta['view'] or meta['path']
+            if options['view'] and view != options['view']:
+                continue
+            meta['prof'] = path[:-len('.json')] + '.prof'
+            views[view].append(meta)
+
+        if not views:
+            self.stdout.write('No matching traces.')
+        for view in sorted(views, key=lambda name: -sum(meta['duration_ms'] for meta in views[name])):
+            self.report(view, views[view], options)
+
+        if options['clear']:
+            for traces in views.values():
+                for meta in traces:
+                    for path in (meta['prof'], meta['prof'][:-len('.prof')] + '.json'):
+                        if os.path.exists(path):
+                            os.remove(path)
+
+    def report(self, view, traces, options):
+        count = len(traces)
+        durations = sorted(meta['duration_ms'] for meta in traces)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{view}  ({count} requests)'))
+        self.stdout.write(
+            f'  total ms: p50 {durations[count // 2]:.1f}  max {durations[-1]:.1f}   '
+            f'sql: {sum(meta["sql_count"] for meta in traces) / count:.1f} queries, '
+            f'{sum(meta["sql_ms"] for meta in traces) / count:.1f} ms per request'
+        )
+
+        files = [meta['prof'] for meta in traces if os.path.exists(meta['prof'])]
+        if files:
+            stats = pstats.Stats(*files).stats
+            index = SORT_KEYS[options['sort']]
+            rows = sorted(stats.items(), key=lambda item: -item[1][index])[:options['limit']]
+            self.stdout.write(f'  {"tottime/req":>12} {"cumtime/req":>12} {"calls/req":>10}  function')
+            for (filename, line, function), (_, calls, tottime, cumtime, _) in rows:
+                self.stdout.write(
+                    f'  {tottime / count * 1000:10.2f}ms {cumtime / count * 1000:10.2f}ms '
+                    f'{calls / count:10.1f}  {function} ({_short_path(filename)}:{line})'
+                )
+
+        statements = defaultdict(lambda: [0, 0.0])
+        for meta in traces:
+            for query in meta['sql']:
+                statements[query['sql']][0] += 1
+                statements[query['sql']][1] += query['duration_ms']
+        if statements:
+            self.stdout.write(f'  {"sql ms/req":>12} {"runs/req":>10}  statement')
+            for sql, (runs, total) in sorted(statements.items(), key=lambda item: -item[1][1])[:options['limit']]:
+                self.stdout.write(f'  {total / count:10.2f}ms {runs / count:10.1f}  {sql[:120]}')
+        self.stdout.write('')
+
+
+def _short_path(filename):
+    for marker in ('site-packages' + os.sep, os.getcwd() + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return filename
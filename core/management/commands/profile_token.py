@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.middleware import issue_profile_token, profiling_config
+
+
+class Command(BaseCommand):
+    help = 'Issue a signed token; requests sending it in the profiling header are profiled.'
+
+    def handle(self, *args, **options):
+        config = profiling_config()
+        if not config['ENABLED']:
+            self.stderr.write(self.style.WARNING('REQUEST_PROFILING is disabled, the token will have no effect.'))
+        self.stdout.write(f"{config['HEADER']}: {issue_profile_token()}")
+        self.stderr.write(f"Valid for {config['TOKEN_MAX_AGE']} seconds.")
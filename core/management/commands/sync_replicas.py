@@ -0,0 +1,35 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database onto the replica files of a local '
+        'setup (doocommerce.settings_replica). Real replicas are kept in sync '
+        'by the database server.'
+    )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only local SQLite replicas can be synced; MySQL replication does this itself.')
+        aliases = replica_aliases()
+        if not aliases:
+            raise CommandError('DATABASE_REPLICAS is empty.')
+
+        source = sqlite3.connect(str(primary.settings_dict['NAME']))
+        try:
+            for alias in aliases:
+                connections[alias].close()
+                target = sqlite3.connect(str(connections[alias].settings_dict['NAME']))
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'Synced {alias}.')
+        finally:
+            source.close()
@@ -0,0 +1,289 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from core.routers import reads_from_replica, replica_aliases, replica_reads
+
+
+logger = logging.getLogger(__name__)
+
+# cProfile allows one active profiler per process (Python 3.12+), so
+# concurrent picked requests on other threads run unprofiled
+_profiling_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# issued or not depending on the backend and on an enclosing atomic block
+# (e.g. TestCase), so they don't count against a budget
+TRANSACTION_CONTROL = ('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def is_transaction_control(sql):
+    return sql.lstrip().upper().startswith(TRANSACTION_CONTROL)
+
+
+class QueryStats:
+    """execute_wrapper that counts queries and accumulates their wall time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not is_transaction_control(sql):
+                self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def view_label(request):
+    """
+    Name the resolved view as '<ViewClass>.<action>' for DRF viewsets (for
+    example 'ProductViewSet.list'), or by its URL view name otherwise.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view_class = getattr(match.func, 'cls', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    if view_class is not None and action:
+        return f'{view_class.__name__}.{action}'
+    return match.view_name
+
+
+class QueryBudgetMiddleware:
+    """
+    Record the number of SQL queries and the DB time of every request.
+
+    Configured by settings.QUERY_BUDGET:
+
+        ENABLED  - install the middleware at all (it is removed otherwise)
+        HEADERS  - add X-DB-Queries / X-DB-Time-Ms to responses
+        ENFORCE  - raise QueryBudgetExceeded instead of logging a warning
+        BUDGETS  - {'ProductViewSet.list': 4, ...} maximum queries per view
+
+    Queries issued while a StreamingHttpResponse is consumed happen after
+    the middleware returns and are not counted.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, 'QUERY_BUDGET', {})
+        if not config.get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.headers = config.get('HEADERS', True)
+        self.enforce = config.get('ENFORCE', False)
+        self.budgets = config.get('BUDGETS', {})
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(stats))
+            response = self.get_response(request)
+
+        label = view_label(request)
+        duration_ms = stats.duration * 1000
+        if self.headers:
+            response['X-DB-Queries'] = str(stats.count)
+            response['X-DB-Time-Ms'] = f'{duration_ms:.1f}'
+        logger.debug('%s %s queries=%d db_ms=%.1f', request.method, label, stats.count, duration_ms)
+
+        budget = self.budgets.get(label)
+        if budget is not None and stats.count > budget:
+            message = f'{label} ran {stats.count} queries, budget is {budget}.'
+            if self.enforce:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+PROFILE_TOKEN_SALT = 'core.middleware.RequestProfilingMiddleware'
+
+
+def profiling_config():
+    config = {
+        'ENABLED': False,
+        'SAMPLE_RATE': 0.0,
+        'HEADER': 'X-Profile-Token',
+        'TOKEN_MAX_AGE': 3600,
+        'DIRECTORY': os.path.join(settings.BASE_DIR, 'profiles'),
+        'SQL_MAX_LENGTH': 500,
+    }
+    config.update(getattr(settings, 'REQUEST_PROFILING', {}))
+    return config
+
+
+def issue_profile_token():
+    """A token that makes the next requests carrying it get profiled."""
+    return signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).sign(uuid.uuid4().hex)
+
+
+class SQLTimeline:
+    """execute_wrapper that records every query with its offset and duration."""
+
+    def __init__(self, started, max_length):
+        self.started = started
+        self.max_length = max_length
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            finished = time.perf_counter()
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'start_ms': round((started - self.started) * 1000, 3),
+                'duration_ms': round((finished - started) * 1000, 3),
+                'sql': sql[:self.max_length],
+            })
+
+
+class RequestProfilingMiddleware:
+    """
+    Profile a sample of requests, or any request carrying a signed token.
+
+    Configured by settings.REQUEST_PROFILING:
+
+        ENABLED        - install the middleware at all (it is removed otherwise)
+        SAMPLE_RATE    - fraction of requests to profile, 0.0 to 1.0
+        HEADER         - request header carrying a token from `profile_token`
+        TOKEN_MAX_AGE  - seconds a token stays valid
+        DIRECTORY      - where traces are written
+        SQL_MAX_LENGTH - SQL statements are truncated to this many characters
+
+    Each profiled request writes a cProfile dump (<id>.prof) and a JSON
+    sidecar (<id>.json) with the view, timings and SQL timeline. Aggregate
+    them with `manage.py profile_report`. Requests that are not picked cost
+    one random() call and a header lookup.
+    """
+
+    def __init__(self, get_response):
+        config = profiling_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config['SAMPLE_RATE']
+        self.header = config['HEADER']
+        self.token_max_age = config['TOKEN_MAX_AGE']
+        self.directory = str(config['DIRECTORY'])
+        self.sql_max_length = config['SQL_MAX_LENGTH']
+        self.signer = signing.TimestampSigner(salt=PROFILE_TOKEN_SALT)
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        if not _profiling_lock.acquire(blocking=False):
+            logger.info('Skipped profiling %s %s, another request is being profiled', request.method, request.path)
+            return self.get_response(request)
+
+        try:
+            started = time.perf_counter()
+            timeline = SQLTimeline(started, self.sql_max_length)
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # a profiler outside this middleware is active
+                logger.info('Skipped profiling %s %s, a profiler is already active', request.method, request.path)
+                return self.get_response(request)
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timeline))
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+            duration = time.perf_counter() - started
+        finally:
+            _profiling_lock.release()
+
+        try:
+            self.save(request, response, trigger, profiler, timeline, duration)
+        except OSError:
+            logger.exception('Could not write request profile to %s', self.directory)
+        return response
+
+    def trigger(self, request):
+        token = request.headers.get(self.header)
+        if token:
+            try:
+                self.signer.unsign(token, max_age=self.token_max_age)
+                return 'token'
+            except signing.BadSignature:
+                logger.warning('Rejected profiling token for %s %s', request.method, request.path)
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def save(self, request, response, trigger, profiler, timeline, duration):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f'{time.strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex[:12]}'
+        base = os.path.join(self.directory, name)
+        profiler.dump_stats(base + '.prof')
+        meta = {
+            'id': name,
+            'view': view_label(request),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'trigger': trigger,
+            'pid': os.getpid(),
+            'duration_ms': round(duration * 1000, 3),
+            'sql_count': len(timeline.queries),
+            'sql_ms': round(sum(query['duration_ms'] for query in timeline.queries), 3),
+            'sql': timeline.queries,
+        }
+        with open(base + '.json', 'w', encoding='utf-8') as stream:
+            json.dump(meta, stream, indent=1)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Let safe-method requests read from the replicas in DATABASE_REPLICAS.
+
+    Unsafe methods run entirely on the primary and set a short-lived cookie
+    (REPLICA_PIN['COOKIE_NAME'], REPLICA_PIN['SECONDS']) so the client's next
+    requests also read from the primary while the replicas catch up, for
+    example the cart read right after adding an item.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        config = getattr(settings, 'REPLICA_PIN', {})
+        self.get_response = get_response
+        self.cookie_name = config.get('COOKIE_NAME', 'db_pin')
+        self.seconds = config.get('SECONDS', 5)
+
+    def __call__(self, request):
+        allowed = request.method in self.SAFE_METHODS and self.cookie_name not in request.COOKIES
+        with replica_reads(allowed):
+            response = self.get_response(request)
+            wrote = allowed and not reads_from_replica()
+        if request.method not in self.SAFE_METHODS or wrote:
+            response.set_cookie(self.cookie_name, '1', max_age=self.seconds, httponly=True, samesite='Lax')
+        return response
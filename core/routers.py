@@ -0,0 +1,67 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# True while the current request may read from a replica. Outside requests
+# (management commands, workers) everything stays on the primary.
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+@contextmanager
+def replica_reads(allowed=True):
+    """Allow (or forbid) replica reads for the duration of the block."""
+    token = _replica_reads.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def pin_to_primary():
+    """Send the remaining reads of the current request to the primary."""
+    _replica_reads.set(False)
+
+
+def reads_from_replica():
+    return _replica_reads.get()
+
+
+class ReplicaRouter:
+    """
+    Route reads to settings.DATABASE_REPLICAS while the current request allows
+    it, see core.middleware.ReplicaPinningMiddleware.
+
+    Any write pins the rest of the request to the primary, so a request
+    never reads back stale data it has just written. Reads inside a
+    transaction on the primary stay there as well.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return DEFAULT_DB_ALIAS
+        replicas = replica_aliases()
+        if not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas receive the schema through replication
+        return db not in replica_aliases()
@@ -1,6 +1,29 @@
 from store.signals import order_created
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
+from core.authentication import invalidate_user
+
 @receiver(order_created)
 def on_order_created(sender, **kwargs):
-    print(kwargs['order'])
\ No newline at end of file
+    print(kwargs['order'])
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+def invalidate_cached_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_user(instance.pk)
+    else:
+        # changed from the group or permission side
+        for user_id in pk_set or ():
+            invalidate_user(user_id)
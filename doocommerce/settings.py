@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -38,7 +39,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'debug_toolbar',
     'rest_framework',
     'django_filters',
     'djoser',
@@ -54,7 +54,9 @@ INTERNAL_IPS = [
 ]
 
 MIDDLEWARE = [
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
+    'core.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +66,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# The debug toolbar is only wired in for local development.
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(0, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'doocommerce.urls'
 
 TEMPLATES = [
@@ -98,6 +105,119 @@ DATABASES = {
     }
 }
 
+# Read replicas: aliases in DATABASE_REPLICAS serve reads of safe-method
+# requests, see core.routers.ReplicaRouter and ReplicaPinningMiddleware.
+# After a write the client reads from the primary for REPLICA_PIN['SECONDS'].
+# doocommerce/settings_replica.py is a local two-file SQLite setup.
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+DATABASE_REPLICAS = []
+
+REPLICA_PIN = {
+    'COOKIE_NAME': 'db_pin',
+    'SECONDS': 5,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The catalog cache versions (store.cache) and the ETags derived from them
+# must be shared by all worker processes: set REDIS_URL (needs the redis
+# package) in production. With the process-local default a write is only
+# seen by other processes once their version keys expire, after
+# STORE_CATALOG_CACHE['LOCAL_VERSION_TIMEOUT'] seconds (check store.W001).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'doocommerce',
+    }
+}
+
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+STORE_CATALOG_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_VERSION_TIMEOUT': 30,
+}
+
+# Price bucket edges for ?facets=price on the product list, see store.facets;
+# None leaves the last bucket open ended.
+
+STORE_FACETS = {
+    'PRICE_BUCKETS': [0, 10, 25, 50, 100, 250, None],
+}
+
+# Display prices, see store.pricing. TaxRule rows override the default rate
+# per region (?region=XX) and collection; MembershipDiscount rows give
+# per-tier discounts.
+
+STORE_PRICING = {
+    'DEFAULT_TAX_RATE': '0.10',
+    'DEFAULT_REGION': '',
+    'REGION_QUERY_PARAM': 'region',
+}
+
+
+# POST /store/orders/batch/, see store.checkout.place_orders. BATCH_SIZE caps
+# the rows per INSERT/UPDATE statement.
+
+STORE_BATCH_ORDERS = {
+    'MAX_ENTRIES': 1000,
+    'BATCH_SIZE': 500,
+}
+
+
+# Per-view SQL query budgets, see core.middleware.QueryBudgetMiddleware.
+# Keys are '<ViewSet>.<action>'. Budgets are for a logged-in, non-staff
+# customer with cold caches: every view includes the JWT user lookup, priced
+# views the customer's membership lookup (AUTH_CACHE misses) and the pricing
+# rules (store.pricing); product views also the content type of the likes
+# count, lists the collection filter. Transaction control statements
+# (BEGIN, SAVEPOINT) are not counted.
+
+QUERY_BUDGET = {
+    'ENABLED': DEBUG,
+    'HEADERS': True,
+    'ENFORCE': False,
+    'BUDGETS': {
+        'ProductViewSet.list': 7,
+        'ProductViewSet.retrieve': 6,
+        'CollectionViewSet.list': 2,
+        'CollectionViewSet.retrieve': 2,
+        'ReviewViewSet.list': 2,
+        'CartViewSet.retrieve': 4,
+        'CartViewSet.summary': 2,
+        'CartItemViewSet.list': 2,
+        'CartItemViewSet.create': 8,
+        'CustomerViewSet.me': 2,
+        'CustomerViewSet.history': 8,
+        'OrderViewSet.list': 5,
+        'OrderViewSet.retrieve': 5,
+        'OrderViewSet.batch': 17,
+    },
+}
+
+
+# Production profiling, see core.middleware.RequestProfilingMiddleware.
+# Profile a random sample with SAMPLE_RATE, or single requests by sending the
+# token printed by `manage.py profile_token`; read the results with
+# `manage.py profile_report`.
+
+REQUEST_PROFILING = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.0,
+    'HEADER': 'X-Profile-Token',
+    'TOKEN_MAX_AGE': 3600,
+    'DIRECTORY': BASE_DIR / 'profiles',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -143,10 +263,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
      'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
 }
 
+# Users resolved from JWTs and their customers are cached for TIMEOUT
+# seconds, see core.authentication and store.customers. Saves drop the
+# entries; with a per-process cache other processes rely on the TTL.
+
+AUTH_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
 
 AUTH_USER_MODEL = 'core.User'
 
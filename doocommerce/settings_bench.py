@@ -0,0 +1,31 @@
+"""
+Settings for the store API benchmark.
+
+Same as the project settings, but on a local SQLite file so the benchmark can
+seed and throw away its own data, with DEBUG off and the query-budget
+middleware reporting per-request query counts. Usage:
+
+    python manage.py benchmark_store --settings=doocommerce.settings_bench
+
+Point BENCH_DATABASE at another file to keep several seeded scales around.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, INSTALLED_APPS, MIDDLEWARE, QUERY_BUDGET
+
+DEBUG = False
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+MIDDLEWARE = [name for name in MIDDLEWARE if not name.startswith('debug_toolbar.')]
+
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCH_DATABASE', str(BASE_DIR / 'bench.sqlite3')),
+    }
+}
+
+QUERY_BUDGET = {**QUERY_BUDGET, 'ENABLED': True, 'HEADERS': True, 'ENFORCE': False}
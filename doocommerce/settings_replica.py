@@ -0,0 +1,29 @@
+"""
+Local primary/replica setup on two SQLite files.
+
+replica.sqlite3 stands in for a read replica: it only sees the primary's
+writes after `sync_replicas` copies them over, which makes replication lag
+easy to reproduce. Usage:
+
+    python manage.py migrate --settings=doocommerce.settings_replica
+    python manage.py sync_replicas --settings=doocommerce.settings_replica
+    python manage.py runserver --settings=doocommerce.settings_replica
+
+Tests mirror the replica onto the primary's test database.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'primary.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_REPLICAS = ['replica']
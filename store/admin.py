@@ -1,10 +1,21 @@
+from decimal import Decimal, InvalidOperation
+
 from django.contrib import admin,messages
-from django.db.models import Count
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Q
 from django.db.models.query import QuerySet
-from django.http import HttpRequest
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.utils.html import format_html
-from django.urls import reverse
+from django.utils.text import slugify
+from django.urls import path, reverse
 from . import models
+from .cache import bump_catalog_version
+from .exports import queryset_csv_lines
+from .facets import price_buckets
+from .pagination import EstimatedCountPaginator
 
 
 # Register your models here.
@@ -15,11 +26,6 @@ class CollectionAdmin(admin.ModelAdmin):
     search_fields = ['title__istartswith','featured_product__istartswith']
     autocomplete_fields = ['featured_product']
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            products_count = Count('products')
-        )
-
     @admin.display(ordering='products_count')
     def products_count(self, collection: models.Collection):
         url = reverse('admin:store_product_changelist') + f'?collection__id__exact={collection.id}'
@@ -43,19 +49,145 @@ class InventoryFilter(admin.SimpleListFilter):
         
 
 
+class PriceRangeFilter(admin.SimpleListFilter):
+    # ranges from STORE_FACETS['PRICE_BUCKETS'] rather than one entry per
+    # distinct price, which needs a DISTINCT over the whole table
+    title = 'Price'
+    parameter_name = 'price_range'
+
+    def lookups(self, request, model_admin):
+        choices = []
+        for low, high in price_buckets():
+            value = f'{low if low is not None else ""}-{high if high is not None else ""}'
+            if high is None:
+                label = f'{low} and up'
+            elif low is None:
+                label = f'Under {high}'
+            else:
+                label = f'{low} to {high}'
+            choices.append((value, label))
+        return choices
+
+    def queryset(self, request, queryset: QuerySet):
+        if not self.value():
+            return queryset
+        low, _, high = self.value().partition('-')
+        try:
+            if low:
+                queryset = queryset.filter(price__gte=Decimal(low))
+            if high:
+                queryset = queryset.filter(price__lt=Decimal(high))
+        except InvalidOperation:
+            return queryset.none()
+        return queryset
+
+
+class TitleRangeFilter(admin.SimpleListFilter):
+    # initial letter ranges, each an index range scan on title
+    title = 'Title'
+    parameter_name = 'title_range'
+    ranges = [('A', 'F'), ('F', 'K'), ('K', 'P'), ('P', 'U'), ('U', '[')]
+
+    def lookups(self, request, model_admin):
+        choices = [(f'{low}{high}', f'{low}-{chr(ord(high) - 1)}') for low, high in self.ranges]
+        return choices + [('other', 'Other')]
+
+    def queryset(self, request, queryset: QuerySet):
+        if self.value() == 'other':
+            return queryset.filter(Q(title__lt=self.ranges[0][0]) | Q(title__gte=self.ranges[-1][1]))
+        for low, high in self.ranges:
+            if self.value() == f'{low}{high}':
+                return queryset.filter(title__gte=low, title__lt=high)
+        return queryset
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables too large to count: the page count comes
+    from EstimatedCountPaginator and the "N total" link, a second exact
+    COUNT(*) of the unfiltered table, is dropped. Use range filters such as
+    PriceRangeFilter instead of distinct-value list_filter fields.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class CSVExportAdminMixin:
+    """
+    Stream the changelist as CSV, either the rows picked for the export_csv
+    action or, from the changelist's "Export CSV" link, every row matching
+    the current filters and search.
+
+    Columns come from csv_export_columns: field paths such as
+    'customer__user__email', or (header, path or callable) pairs. Add
+    ?columns=a,b to the export link to pick some of them by header. Rows are
+    read in primary key order, csv_export_chunk_size at a time.
+    """
+    change_list_template = 'admin/store/csv_export_change_list.html'
+    csv_export_columns = []
+    csv_export_select_related = []
+    csv_export_prefetch_related = []
+    csv_export_chunk_size = 1000
+
+    def get_csv_export_columns(self, names=None):
+        columns = [(column, column) if isinstance(column, str) else column for column in self.csv_export_columns]
+        if not names:
+            return columns
+        by_header = dict(columns)
+        return [(name, by_header[name]) for name in names]
+
+    def csv_export_response(self, queryset, columns=None):
+        queryset = queryset.select_related(*self.csv_export_select_related).prefetch_related(
+            *self.csv_export_prefetch_related
+        )
+        response = StreamingHttpResponse(
+            queryset_csv_lines(queryset, columns or self.get_csv_export_columns(), self.csv_export_chunk_size),
+            content_type='text/csv',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{slugify(self.opts.verbose_name_plural)}.csv"'
+        return response
+
+    @admin.action(description='Export selected to CSV', permissions=['view'])
+    def export_csv(self, request, queryset):
+        return self.csv_export_response(queryset)
+
+    def get_urls(self):
+        name = f'{self.opts.app_label}_{self.opts.model_name}_export'
+        return [path('export/', self.admin_site.admin_view(self.csv_export_view), name=name)] + super().get_urls()
+
+    def csv_export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        # the remaining parameters are the changelist's filters and search
+        request.GET = request.GET.copy()
+        names = request.GET.pop('columns', [''])[-1]
+        request.GET.pop(PAGE_VAR, None)
+        try:
+            columns = self.get_csv_export_columns(names.split(',') if names else None)
+        except KeyError as error:
+            return HttpResponseBadRequest(f'Unknown column {error}.')
+        try:
+            queryset = self.get_changelist_instance(request).get_queryset(request)
+        except IncorrectLookupParameters:
+            return HttpResponseBadRequest('Invalid filter.')
+        return self.csv_export_response(queryset, columns)
+
+
 # INLINE CLASS TO MANAGE TAGS
    
 
 @admin.register(models.Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(CSVExportAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
     # readonly_fields = ['slug']
     autocomplete_fields = ['collection']
     fields = ['title', 'description', 'slug', 'price', 'inventory', 'collection']
     prepopulated_fields = {'slug': ('title',)}
-    actions = ['clear_inventory']
+    actions = ['clear_inventory', 'export_csv']
+    csv_export_columns = ['id', 'title', 'slug', 'price', 'inventory', ('collection', 'collection__title')]
+    csv_export_select_related = ['collection']
     list_display = ['title', 'slug', 'price', 'inventory_status', 'collection__title']
     list_editable = ['price']
-    list_filter = ['title','price',InventoryFilter]
+    list_filter = [TitleRangeFilter, PriceRangeFilter, InventoryFilter]
     list_per_page = 10
     list_select_related = ['collection']
     search_fields = ['title__istartswith']
@@ -70,22 +202,27 @@ class ProductAdmin(admin.ModelAdmin):
     @admin.action(description='Clear Inventory')
     def clear_inventory(self, request, queryset):
         updated_count = queryset.update(inventory=0)
+        # update() skips the post_save handler that invalidates the catalog
+        transaction.on_commit(bump_catalog_version)
         self.message_user(request, f'{updated_count} products were successfully updated',messages.ERROR)
 
 
     
 @admin.register(models.Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(CSVExportAdminMixin, admin.ModelAdmin):
     list_display = ['first_name', 'last_name', 'membership','order_count']
     list_editable = ['membership']
-    list_select_related = ['user']
+    # order counts come from the precomputed summary, see store.history
+    list_select_related = ['user', 'order_summary']
     ordering = ['user__first_name', 'user__last_name']
-    search_fields = ['first_name__istartswith', 'last_name__istartswith']
-
-    def get_queryset(self, request: HttpRequest) -> QuerySet:
-        return super().get_queryset(request).annotate(
-            order_count = Count('order')
-        )
+    search_fields = ['user__first_name__istartswith', 'user__last_name__istartswith']
+    actions = ['export_csv']
+    csv_export_columns = [
+        'id', ('first_name', 'user__first_name'), ('last_name', 'user__last_name'), ('email', 'user__email'),
+        'phone', 'birth_date', 'membership',
+        ('orders_count', 'order_summary__orders_count'), ('total_spent', 'order_summary__total_spent'),
+    ]
+    csv_export_select_related = ['user', 'order_summary']
     
     def __str__(self) -> str:
         return f'{self.user.first_name} {self.user.last_name}'
@@ -97,9 +234,10 @@ class CustomerAdmin(admin.ModelAdmin):
     def last_name(self, customer: models.Customer):
         return customer.user.last_name
     
-    @admin.display(ordering='order_count')
-    def order_count(self, order: models.Order):
-        return order.order_count
+    @admin.display(ordering='order_summary__orders_count')
+    def order_count(self, customer: models.Customer):
+        summary = getattr(customer, 'order_summary', None)
+        return summary.orders_count if summary is not None else 0
    
 
 
@@ -112,18 +250,52 @@ class OrderItemInline(admin.TabularInline):
     autocomplete_fields = ['product']
 
 @admin.register(models.Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(CSVExportAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'placed_at', 'customer','payment_status']
-    list_select_related = ['customer']
-    search_fields = ['customer__first_name__istartswith', 'customer__last_name__istartswith']
+    # Customer.__str__ reads the user's name
+    list_select_related = ['customer__user']
+    list_filter = ['payment_status']
+    # ids grow with placed_at, and the primary key needs no extra index to sort
+    ordering = ['-id']
+    search_fields = ['customer__user__first_name__istartswith', 'customer__user__last_name__istartswith']
     autocomplete_fields = ['customer']
     inlines = [OrderItemInline]
+    actions = ['export_csv']
+    csv_export_columns = [
+        'id', 'placed_at', 'customer_id', ('customer_email', 'customer__user__email'), 'payment_status',
+        ('items', lambda order: sum(item.quantity for item in order.order_items.all())),
+        ('total', lambda order: sum(item.quantity * item.price for item in order.order_items.all())),
+    ]
+    csv_export_select_related = ['customer__user']
+    csv_export_prefetch_related = ['order_items']
 
 
 @admin.register(models.Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [ 'created_at']
+    ordering = ['-created_at']
 
 @admin.register(models.CartItem)
-class CartItemAdmin(admin.ModelAdmin):
-    list_display = ['cart', 'product', 'quantity']
\ No newline at end of file
+class CartItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['cart', 'product', 'quantity']
+    list_select_related = ['cart', 'product']
+    ordering = ['-id']
+    autocomplete_fields = ['product']
+    raw_id_fields = ['cart']
+
+@admin.register(models.OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'topic', 'status', 'attempts', 'created_at', 'processed_at']
+    list_filter = ['status', 'topic']
+    readonly_fields = ['created_at', 'processed_at', 'last_error']
+
+@admin.register(models.TaxRule)
+class TaxRuleAdmin(admin.ModelAdmin):
+    list_display = ['region', 'collection', 'rate']
+    list_select_related = ['collection']
+    list_filter = ['region']
+    autocomplete_fields = ['collection']
+
+@admin.register(models.MembershipDiscount)
+class MembershipDiscountAdmin(admin.ModelAdmin):
+    list_display = ['membership', 'percent']
@@ -0,0 +1,218 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.response import Response
+
+from core.routers import reads_from_replica, replica_aliases
+
+
+CATALOG_VERSION_KEY = 'store:catalog:version'
+CATALOG_HITS_KEY = 'store:catalog:hits'
+CATALOG_MISSES_KEY = 'store:catalog:misses'
+
+
+# backends whose entries live in one process and are invisible to the others
+LOCAL_CACHE_BACKENDS = (LocMemCache, DummyCache)
+
+
+def get_catalog_cache():
+    return caches[settings.STORE_CATALOG_CACHE.get('ALIAS', 'default')]
+
+
+def is_shared_cache(cache):
+    return not isinstance(cache, LOCAL_CACHE_BACKENDS)
+
+
+def version_timeout(cache):
+    """
+    Version keys never expire in a shared cache. In a process-local one they
+    expire after LOCAL_VERSION_TIMEOUT seconds, which bounds how long one
+    worker keeps serving entries and ETags another worker's write made stale.
+    """
+    if is_shared_cache(cache):
+        return None
+    return settings.STORE_CATALOG_CACHE.get('LOCAL_VERSION_TIMEOUT', 30)
+
+
+def get_version(key):
+    cache = get_catalog_cache()
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted or expired counter never reuses old keys.
+        cache.add(key, int(time.time() * 1000), version_timeout(cache))
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    cache = get_catalog_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return get_version(key)
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def product_version_key(product_id):
+    return f'store:product:{product_id}:version'
+
+
+def get_product_versions(product_ids):
+    """{product id: version} with one get_many, seeding the missing keys."""
+    keys = {product_version_key(product_id): product_id for product_id in product_ids}
+    found = get_catalog_cache().get_many(list(keys))
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, product_id in keys.items():
+        if product_id not in versions:
+            versions[product_id] = get_version(key)
+    return versions
+
+
+def bump_product_versions(product_ids):
+    """
+    Invalidate the cached pages and ETags holding these products after
+    writes that only touch them, such as stock reservations and like counts.
+    """
+    for product_id in set(product_ids):
+        bump_version(product_version_key(product_id))
+
+
+def payload_product_ids(data):
+    """Product ids in a serialized product list page or product."""
+    if isinstance(data, dict) and 'results' in data:
+        data = data['results']
+    if isinstance(data, dict):
+        return [data['id']] if 'id' in data else []
+    return [row['id'] for row in data]
+
+
+def reviews_version_key(product_id):
+    return f'store:reviews:{product_id}:version'
+
+
+def _count(key):
+    cache = get_catalog_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def catalog_cache_stats():
+    cache = get_catalog_cache()
+    hits = cache.get(CATALOG_HITS_KEY, 0)
+    misses = cache.get(CATALOG_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'version': cache.get(CATALOG_VERSION_KEY),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def reset_catalog_cache_stats():
+    get_catalog_cache().delete_many([CATALOG_HITS_KEY, CATALOG_MISSES_KEY])
+
+
+def catalog_cache_key(request, view):
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    digest = hashlib.md5(repr(params).encode('utf-8')).hexdigest()
+    return 'store:catalog:{version}:{basename}:{action}:{pk}:{variant}:{digest}'.format(
+        version=get_catalog_version(),
+        basename=view.basename,
+        action=view.action,
+        pk=view.kwargs.get(view.lookup_url_kwarg or view.lookup_field, ''),
+        variant=view.get_cache_variant(),
+        digest=digest,
+    )
+
+
+class CatalogCacheMixin:
+    """
+    Read-through cache of serialized list/retrieve payloads.
+
+    Keys embed the catalog version, which the post_save/post_delete handlers
+    bump whenever a Product or Collection changes, so stale entries are never
+    read again and simply age out of the backend.
+
+    Entries also record the version of each product returned by
+    get_cached_product_ids(); one of them changing, e.g. a stock
+    reservation, turns only the entries holding that product into misses.
+    """
+    catalog_cache_actions = ('list', 'retrieve')
+
+    def get_cache_variant(self):
+        # anything besides the URL the payload depends on, such as the pricing tier
+        return ''
+
+    def get_cached_product_ids(self, data):
+        return []
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_catalog_cache_key(self, request):
+        # computed once, before the query, so a version bumped while the page
+        # is built keys the next request's entry rather than this stale one
+        if not hasattr(self, '_catalog_key'):
+            self._catalog_key = catalog_cache_key(request, self)
+        return self._catalog_key
+
+    def get_cached_entry(self, request):
+        """
+        The fresh cache entry for this request, or None; the backend is read
+        once per request, so conditional GET validators can share it.
+        """
+        if not hasattr(self, '_catalog_entry'):
+            # A client pinned to the primary after a write must not be served an
+            # entry a lagging replica produced; it reads through and refreshes it.
+            pinned = bool(replica_aliases()) and not reads_from_replica()
+            entry = None if pinned else get_catalog_cache().get(self.get_catalog_cache_key(request))
+            if entry is not None and entry['products']:
+                if get_product_versions(entry['products']) != entry['products']:
+                    entry = None
+            self._catalog_entry = entry
+        return self._catalog_entry
+
+    def _cached_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.catalog_cache_actions:
+            return handler(request, *args, **kwargs)
+
+        entry = self.get_cached_entry(request)
+        if entry is not None:
+            _count(CATALOG_HITS_KEY)
+            response = Response(entry['data'])
+            response['X-Catalog-Cache'] = 'HIT'
+            return response
+
+        _count(CATALOG_MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            # read after the query: a write committing in between may store
+            # its new version next to the old row, for at most TIMEOUT
+            versions = get_product_versions(self.get_cached_product_ids(response.data))
+            entry = {'data': response.data, 'products': versions}
+            timeout = settings.STORE_CATALOG_CACHE.get('TIMEOUT', 300)
+            get_catalog_cache().set(self.get_catalog_cache_key(request), entry, timeout)
+            self._catalog_entry = entry
+        response['X-Catalog-Cache'] = 'MISS'
+        return response
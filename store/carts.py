@@ -0,0 +1,122 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from store.models import Cart, CartItem, Product
+
+
+def adjust_cart_totals(cart_id, quantity, amount):
+    """
+    Apply a quantity/amount delta to the stored cart totals in one UPDATE.
+    The totals are clamped at 0 if they drifted; repair_cart_totals fixes them.
+    """
+    Cart.objects.filter(pk=cart_id).update(
+        items_count=Greatest(F('items_count') + quantity, 0),
+        subtotal=Greatest(F('subtotal') + amount, Value(Decimal('0.00'))),
+    )
+
+
+def refresh_cart_totals(carts):
+    """
+    Recompute stored totals from the cart's own items.
+
+    `carts` is a queryset of carts; the recomputation is a single UPDATE with
+    correlated subqueries, so it is bounded by the size of each cart rather
+    than by the CartItem table.
+    """
+    items = CartItem.objects.filter(cart_id=OuterRef('pk')).order_by().values('cart_id')
+    quantity = items.annotate(total=Sum('quantity')).values('total')
+    amount = items.annotate(total=Sum(F('quantity') * F('price'))).values('total')
+    return carts.update(
+        items_count=Coalesce(Subquery(quantity, output_field=IntegerField()), Value(0)),
+        subtotal=Coalesce(
+            Subquery(amount, output_field=DecimalField(max_digits=12, decimal_places=2)),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+def sweep_carts(created_before, batch_size):
+    """
+    Delete carts created before `created_before`, with their items, in
+    batches of `batch_size`.
+
+    Batches walk the (created_at, pk) index, so each one is a short range scan
+    and a delete in its own transaction; no lock outlives a batch. Yields
+    (carts deleted, items deleted) after every batch.
+    """
+    cursor = None
+    while True:
+        carts = Cart.objects.filter(created_at__lt=created_before).order_by('created_at', 'pk')
+        if cursor is not None:
+            created_at, pk = cursor
+            carts = carts.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+        batch = list(carts.values_list('created_at', 'pk')[:batch_size])
+        if not batch:
+            return
+        cursor = batch[-1]
+        with transaction.atomic():
+            _, deleted = Cart.objects.filter(pk__in=[pk for _, pk in batch]).delete()
+        yield deleted.get(Cart._meta.label, 0), deleted.get(CartItem._meta.label, 0)
+        if len(batch) < batch_size:
+            return
+
+
+def snapshot_missing_prices(items):
+    """Fill CartItem.price from the current product price where it was never set."""
+    return items.filter(price__isnull=True).update(
+        price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1])
+    )
+
+
+def _upsert_sql(count):
+    quote = connection.ops.quote_name
+    table = quote(CartItem._meta.db_table)
+    columns = ', '.join(quote(column) for column in ('cart_id', 'product_id', 'quantity', 'price'))
+    values = ', '.join(['(%s, %s, %s, %s)'] * count)
+    quantity, price = quote('quantity'), quote('price')
+
+    if connection.vendor == 'mysql':
+        return (
+            f'INSERT INTO {table} ({columns}) VALUES {values} '
+            f'ON DUPLICATE KEY UPDATE {quantity} = {quantity} + VALUES({quantity}), '
+            f'{price} = COALESCE({price}, VALUES({price}))'
+        )
+    # SQLite and PostgreSQL share the ON CONFLICT syntax.
+    return (
+        f'INSERT INTO {table} ({columns}) VALUES {values} '
+        f'ON CONFLICT ({quote("cart_id")}, {quote("product_id")}) DO UPDATE SET '
+        f'{quantity} = {table}.{quantity} + excluded.{quantity}, '
+        f'{price} = COALESCE({table}.{price}, excluded.{price})'
+    )
+
+
+def add_cart_items(cart_id, items):
+    """
+    Add [(product_id, quantity, price)] to a cart with a single upsert.
+
+    Quantities of products already in the cart are incremented in the
+    database, so concurrent adds of the same product never race into the
+    (cart, product) unique constraint. Existing price snapshots are kept.
+    Returns the affected cart items.
+    """
+    merged = {}
+    for product_id, quantity, price in items:
+        previous = merged.get(product_id)
+        merged[product_id] = (previous[0] + quantity if previous else quantity, price)
+    if not merged:
+        return []
+
+    cart_pk = CartItem._meta.get_field('cart').get_db_prep_value(cart_id, connection)
+    params = []
+    for product_id, (quantity, price) in merged.items():
+        params.extend([cart_pk, product_id, quantity, price])
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(_upsert_sql(len(merged)), params)
+        refresh_cart_totals(Cart.objects.filter(pk=cart_id))
+        return list(CartItem.objects.filter(cart_id=cart_id, product_id__in=merged).order_by('pk'))
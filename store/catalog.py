@@ -0,0 +1,141 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from store.models import Collection, Product
+from store.search import rebuild_index
+
+
+def adjust_products_count(collection_id, delta):
+    # clamped at 0: a count that drifted (writes that skip the signals) must
+    # not fail the delete, reconcile_collection_counts repairs it
+    if collection_id is not None:
+        Collection.objects.filter(pk=collection_id).update(products_count=Greatest(F('products_count') + delta, 0))
+
+
+def refresh_products_count(collections):
+    """Recompute products_count for a queryset of collections in one UPDATE."""
+    counts = (
+        Product.objects.filter(collection_id=OuterRef('pk'))
+        .order_by()
+        .values('collection_id')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return collections.update(
+        products_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+    )
+
+
+CATALOG_COLUMNS = ['slug', 'title', 'description', 'price', 'inventory', 'collection']
+
+
+class CatalogRowError(ValueError):
+    pass
+
+
+def _cell(row, column):
+    # CSV cells are strings, NDJSON values may also be numbers
+    value = row.get(column)
+    return value.strip() if isinstance(value, str) else value
+
+
+def _clean_field(name, value):
+    # the model field's own checks: finite, max_digits/decimal_places, minimum
+    try:
+        return Product._meta.get_field(name).clean(value, None)
+    except ValidationError as error:
+        raise CatalogRowError(f'{name}: {" ".join(error.messages)}')
+
+
+def parse_row(row):
+    """Validate one import row (dict keyed by CATALOG_COLUMNS)."""
+    slug = (row.get('slug') or '').strip()
+    title = (row.get('title') or '').strip()
+    if not slug or not title:
+        raise CatalogRowError('slug and title are required')
+    price = _clean_field('price', _cell(row, 'price'))
+    inventory = _clean_field('inventory', _cell(row, 'inventory') or 0)
+    return {
+        'slug': slug,
+        'title': title,
+        'description': row.get('description') or None,
+        'price': price,
+        'inventory': inventory,
+        'collection': (row.get('collection') or '').strip() or None,
+    }
+
+
+def _collection_ids(titles):
+    found = {}
+    for collection_id, title in Collection.objects.filter(title__in=titles).order_by('pk').values_list('id', 'title'):
+        found.setdefault(title, collection_id)
+    missing = [title for title in titles if title not in found]
+    if missing:
+        Collection.objects.bulk_create([Collection(title=title) for title in missing])
+        # bulk_create does not return primary keys on MySQL, so read them back
+        for collection_id, title in Collection.objects.filter(title__in=missing).order_by('pk').values_list('id', 'title'):
+            found.setdefault(title, collection_id)
+    return found
+
+
+def import_chunk(rows):
+    """
+    Upsert one chunk of parsed rows keyed on slug.
+
+    Uses one lookup for existing slugs, one bulk_create and one bulk_update,
+    then reindexes the chunk for search. Returns (created, updated, touched
+    collection ids). bulk_* skip model signals, so callers must refresh
+    collection counts and the catalog version once the import is done.
+    """
+    rows = {row['slug']: row for row in rows}
+    collections = _collection_ids({row['collection'] for row in rows.values() if row['collection']})
+
+    existing = {}
+    touched = set()
+    for product_id, slug, collection_id in (
+        Product.objects.filter(slug__in=rows).order_by('pk').values_list('id', 'slug', 'collection_id')
+    ):
+        if slug not in existing:
+            existing[slug] = product_id
+            touched.add(collection_id)
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for slug, row in rows.items():
+        product = Product(
+            id=existing.get(slug),
+            slug=slug,
+            title=row['title'],
+            description=row['description'],
+            price=row['price'],
+            inventory=row['inventory'],
+            collection_id=collections.get(row['collection']),
+            last_update=now,
+        )
+        touched.add(product.collection_id)
+        (to_update if product.id else to_create).append(product)
+
+    with transaction.atomic():
+        Product.objects.bulk_create(to_create)
+        Product.objects.bulk_update(
+            to_update,
+            ['title', 'description', 'price', 'inventory', 'collection', 'last_update'],
+        )
+        rebuild_index(Product.objects.filter(slug__in=rows), chunk_size=max(len(rows), 1))
+
+    touched.discard(None)
+    return len(to_create), len(to_update), touched
+
+
+def export_rows(chunk_size=2000):
+    """Yield catalog rows with bounded memory, in primary key order."""
+    products = (
+        Product.objects.order_by('pk')
+        .values_list('slug', 'title', 'description', 'price', 'inventory', 'collection__title')
+        .iterator(chunk_size=chunk_size)
+    )
+    for values in products:
+        yield dict(zip(CATALOG_COLUMNS, values))
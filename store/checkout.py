@@ -0,0 +1,143 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from store.cache import bump_product_versions
+from store.history import record_orders_created
+from store.models import Cart, CartItem, Order, OrderItem, Product
+from store.outbox import enqueue_many
+from store.pricing import Pricer
+
+
+def batch_order_settings():
+    config = {'MAX_ENTRIES': 1000, 'BATCH_SIZE': 500}
+    config.update(getattr(settings, 'STORE_BATCH_ORDERS', {}))
+    return config
+
+
+def _entry_lines(entries):
+    """
+    Resolve every entry to {product_id: quantity}, reading all carts with two
+    queries. Returns (lines by entry index, errors by entry index).
+    """
+    lines, errors = {}, {}
+    cart_ids = {entry['cart_id'] for entry in entries if 'cart_id' in entry}
+    carts, cart_lines = set(), {}
+    if cart_ids:
+        carts = set(Cart.objects.filter(pk__in=cart_ids).values_list('pk', flat=True))
+        items = CartItem.objects.filter(cart_id__in=carts).values_list('cart_id', 'product_id', 'quantity')
+        for cart_id, product_id, quantity in items:
+            cart_lines.setdefault(cart_id, {})[product_id] = quantity
+
+    used = set()
+    for index, entry in enumerate(entries):
+        if 'cart_id' not in entry:
+            quantities = {}
+            for item in entry['items']:
+                quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+            lines[index] = quantities
+            continue
+        cart_id = entry['cart_id']
+        if cart_id not in carts:
+            errors[index] = {'cart_id': ['No cart with the given ID was found.']}
+        elif cart_id in used:
+            errors[index] = {'cart_id': ['The cart is used by another entry.']}
+        elif cart_id not in cart_lines:
+            errors[index] = {'cart_id': ['The cart is empty.']}
+        else:
+            used.add(cart_id)
+            lines[index] = cart_lines[cart_id]
+    return lines, errors
+
+
+def place_orders(customer, entries, pricer=None):
+    """
+    Place one order per entry for customer with a constant number of queries
+    (per STORE_BATCH_ORDERS['BATCH_SIZE'] rows).
+
+    An entry is {'cart_id': ...} or {'items': [{'product_id': ..., 'quantity': ...}]}.
+    Entries are validated and allocated stock in order and fail on their own;
+    returns one {'index', 'order_id'} or {'index', 'errors'} per entry.
+    Items are priced with pricer, by default one for the customer's tier.
+
+    The products are locked in ascending id order, like reserve_inventory,
+    so batches and single checkouts cannot deadlock each other. bulk_create
+    skips the Order signals, so the outbox events and order summaries are
+    written here.
+    """
+    batch_size = batch_order_settings()['BATCH_SIZE']
+    lines, errors = _entry_lines(entries)
+    product_ids = sorted({product_id for quantities in lines.values() for product_id in quantities})
+
+    with transaction.atomic():
+        products = {
+            product['id']: product
+            for product in Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk')
+            .values('id', 'price', 'collection_id', 'inventory')
+        }
+        stock = {product_id: product['inventory'] for product_id, product in products.items()}
+
+        placed = []
+        for index, quantities in lines.items():
+            unknown = [product_id for product_id in quantities if product_id not in products]
+            if unknown:
+                errors[index] = {'items': [
+                    {'product_id': product_id, 'error': 'No product with the given ID was found.'}
+                    for product_id in unknown
+                ]}
+                continue
+            short = [(product_id, quantity) for product_id, quantity in quantities.items() if stock[product_id] < quantity]
+            if short:
+                errors[index] = {'items': [
+                    {'product_id': product_id, 'quantity': quantity, 'error': 'Not enough items in stock.'}
+                    for product_id, quantity in short
+                ]}
+                continue
+            for product_id, quantity in quantities.items():
+                stock[product_id] -= quantity
+            placed.append(index)
+
+        orders = []
+        if placed:
+            reserved = [
+                (product_id, product['inventory'] - stock[product_id])
+                for product_id, product in products.items() if stock[product_id] != product['inventory']
+            ]
+            for start in range(0, len(reserved), batch_size):
+                chunk = reserved[start:start + batch_size]
+                Product.objects.filter(pk__in=[product_id for product_id, _ in chunk]).update(
+                    inventory=F('inventory') - Case(*(When(pk=product_id, then=Value(quantity)) for product_id, quantity in chunk)),
+                )
+
+            orders = [Order(customer=customer, reference=uuid4()) for _ in placed]
+            Order.objects.bulk_create(orders, batch_size=batch_size)
+            if orders[0].pk is None:
+                ids = dict(
+                    Order.objects.filter(reference__in=[order.reference for order in orders])
+                    .values_list('reference', 'pk')
+                )
+                for order in orders:
+                    order.pk = ids[order.reference]
+
+            prices = (pricer or Pricer(membership=customer.membership)).price_products(products.values())
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(order=order, product_id=product_id, quantity=quantity, price=prices[product_id].unit_price)
+                    for order, index in zip(orders, placed)
+                    for product_id, quantity in lines[index].items()
+                ],
+                batch_size=batch_size,
+            )
+            Cart.objects.filter(pk__in=[entries[index]['cart_id'] for index in placed if 'cart_id' in entries[index]]).delete()
+            enqueue_many('order_created', [{'order_id': order.pk} for order in orders], batch_size=batch_size)
+            record_orders_created(orders)
+            reserved_ids = [product_id for product_id, _ in reserved]
+            transaction.on_commit(lambda: bump_product_versions(reserved_ids))
+
+    order_ids = {index: order.pk for index, order in zip(placed, orders)}
+    return [
+        {'index': index, 'order_id': order_ids[index]} if index in order_ids else {'index': index, 'errors': errors[index]}
+        for index in range(len(entries))
+    ]
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from store.cache import get_catalog_cache, is_shared_cache
+
+
+@register()
+def check_catalog_cache_is_shared(app_configs, **kwargs):
+    if settings.DEBUG or is_shared_cache(get_catalog_cache()):
+        return []
+    return [
+        Warning(
+            'The catalog cache is local to each process.',
+            hint=(
+                'Writes in one worker reach the cached pages and ETags of the others only after '
+                "STORE_CATALOG_CACHE['LOCAL_VERSION_TIMEOUT'] seconds. Set REDIS_URL or point "
+                "STORE_CATALOG_CACHE['ALIAS'] at a shared cache."
+            ),
+            id='store.W001',
+        )
+    ]
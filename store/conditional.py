@@ -0,0 +1,101 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from store.cache import get_catalog_version, get_product_versions, get_version, reviews_version_key
+
+
+class ConditionalGetMixin:
+    """
+    ETag support for list and retrieve.
+
+    Views provide a cheap token through get_list_validators() and
+    get_detail_validators(), computed from version keys without running the
+    view. When the client's If-None-Match still matches, a 304 is returned
+    before the queryset is evaluated or the body serialized.
+
+    A view that cannot name its token yet returns None: the request is served
+    in full and the validator asked again afterwards, only to tag the 200.
+    """
+
+    def get_list_validators(self):
+        return None
+
+    def get_detail_validators(self):
+        return None
+
+    def get_cache_variant(self):
+        return ''
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(self.get_list_validators, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(self.get_detail_validators, super().retrieve, request, *args, **kwargs)
+
+    def _etag(self, request, token):
+        # The representation also depends on the URL (filters, page), the
+        # negotiated renderer and the view's variant, so all go into the tag.
+        raw = f'{token}:{request.get_full_path()}:{request.accepted_media_type}:{self.get_cache_variant()}'
+        return quote_etag(hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+    def _conditional_response(self, validators, handler, request, *args, **kwargs):
+        token = validators()
+        if token is not None:
+            etag = self._etag(request, token)
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                if not_modified.status_code == 304:
+                    not_modified['ETag'] = etag
+                return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            if token is None:
+                token = validators()
+            if token is not None:
+                response['ETag'] = self._etag(request, token)
+        return response
+
+
+class ProductConditionalMixin(ConditionalGetMixin):
+    # Stock and like counts change per product without a catalog version
+    # bump, so the tags also cover the versions of the products shown.
+
+    def get_list_validators(self):
+        # The catalog cache key names everything the page depends on (catalog
+        # version, filters, page, variant) and the cached entry which products
+        # it holds; without an entry the page's products are not known yet.
+        entry = self.get_cached_entry(self.request)
+        if entry is None:
+            return None
+        versions = entry['products']
+        products = ','.join(f'{product_id}.{versions[product_id]}' for product_id in sorted(versions))
+        return f'{self.get_catalog_cache_key(self.request)}:{products}'
+
+    def get_detail_validators(self):
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        try:
+            lookup = self.get_queryset().model._meta.pk.to_python(lookup)
+        except ValidationError:
+            # not a valid pk: no validators, the view answers 404
+            return None
+        return f'{get_catalog_version()}:{lookup}:{get_product_versions([lookup])[lookup]}'
+
+
+class CatalogVersionConditionalMixin(ConditionalGetMixin):
+    def get_list_validators(self):
+        return get_catalog_version()
+
+    def get_detail_validators(self):
+        return get_catalog_version()
+
+
+class ReviewConditionalMixin(ConditionalGetMixin):
+    def get_list_validators(self):
+        return get_version(reviews_version_key(self.kwargs['product_pk']))
+
+    def get_detail_validators(self):
+        return get_version(reviews_version_key(self.kwargs['product_pk']))
@@ -0,0 +1,39 @@
+from core.authentication import auth_cache_config, get_auth_cache
+from store.models import Customer
+
+
+def customer_cache_key(user_id):
+    return f'store:customer:user:{user_id}'
+
+
+def invalidate_customer(user_id):
+    get_auth_cache().delete(customer_cache_key(user_id))
+
+
+def get_customer_for_user(user_id):
+    """The user's Customer from the auth cache, loaded on a miss; None if there is none."""
+    cache = get_auth_cache()
+    key = customer_cache_key(user_id)
+    customer = cache.get(key)
+    if customer is None:
+        customer = Customer.objects.filter(user_id=user_id).first()
+        if customer is None:
+            return None
+        cache.set(key, customer, auth_cache_config()['TIMEOUT'])
+    return customer
+
+
+def get_customer(request):
+    """
+    The authenticated user's Customer, resolved once per request.
+
+    Use it for reads; writes should load the row fresh, since the cached
+    copy may be up to AUTH_CACHE['TIMEOUT'] seconds old in other processes.
+    """
+    if not hasattr(request, '_store_customer'):
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            request._store_customer = None
+        else:
+            request._store_customer = get_customer_for_user(user.id)
+    return request._store_customer
@@ -0,0 +1,167 @@
+import csv
+import json
+from datetime import datetime, time
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Min, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from store.models import Order, OrderItem
+
+
+ORDER_CSV_COLUMNS = [
+    'order_id', 'placed_at', 'customer_id', 'payment_status',
+    'item_id', 'product_id', 'product_title', 'quantity', 'price',
+]
+
+
+class Echo:
+    """File-like object whose write() hands the value back, for csv.writer streaming."""
+
+    def write(self, value):
+        return value
+
+
+def parse_boundary(value, end_of_day=False):
+    """Parse an ISO date or datetime filter value; returns None when invalid."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filter_orders(queryset, placed_after=None, placed_before=None, payment_status=None):
+    """
+    Filter orders for an export. A date range is also bounded by id, read
+    from order_placed_idx, so the pk-ordered chunks of iter_queryset only
+    walk the part of the table the range covers.
+    """
+    if placed_after is not None:
+        queryset = queryset.filter(placed_at__gte=placed_after)
+        first_id = Order.objects.filter(placed_at__gte=placed_after).aggregate(id=Min('id'))['id']
+        queryset = queryset.filter(pk__gte=first_id) if first_id is not None else queryset.none()
+    if placed_before is not None:
+        queryset = queryset.filter(placed_at__lte=placed_before)
+        last_id = Order.objects.filter(placed_at__lte=placed_before).aggregate(id=Max('id'))['id']
+        queryset = queryset.filter(pk__lte=last_id) if last_id is not None else queryset.none()
+    if payment_status:
+        queryset = queryset.filter(payment_status=payment_status)
+    return queryset
+
+
+def iter_queryset(queryset, chunk_size=500):
+    """
+    Yield the queryset's objects walking the primary key in keyset-ordered
+    chunks. select_related and prefetch_related apply per chunk, and only
+    one chunk is held in memory at a time.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        objects = list(chunk[:chunk_size])
+        if not objects:
+            return
+        yield from objects
+        if len(objects) < chunk_size:
+            return
+        last_pk = objects[-1].pk
+
+
+def iter_orders(queryset, chunk_size=500):
+    """
+    Yield orders with their items and products. Each chunk costs two queries
+    (orders, then items joined to products), see iter_queryset.
+    """
+    items = OrderItem.objects.select_related('product').only(
+        'id', 'order_id', 'quantity', 'price', 'product__id', 'product__title',
+    )
+    return iter_queryset(queryset.prefetch_related(Prefetch('order_items', queryset=items)), chunk_size)
+
+
+def order_as_dict(order):
+    return {
+        'id': order.id,
+        'placed_at': order.placed_at,
+        'customer': order.customer_id,
+        'payment_status': order.payment_status,
+        'order_items': [
+            {
+                'id': item.id,
+                'product': {'id': item.product.id, 'title': item.product.title},
+                'quantity': item.quantity,
+                'price': item.price,
+            }
+            for item in order.order_items.all()
+        ],
+    }
+
+
+def order_ndjson_lines(orders):
+    for order in orders:
+        yield json.dumps(order_as_dict(order), cls=DjangoJSONEncoder) + '\n'
+
+
+def order_csv_rows(orders):
+    for order in orders:
+        for item in order.order_items.all():
+            yield [
+                order.id, order.placed_at.isoformat(), order.customer_id, order.payment_status,
+                item.id, item.product.id, item.product.title, item.quantity, item.price,
+            ]
+
+
+# spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_cell(value):
+    """Quote text that a spreadsheet would evaluate with a leading apostrophe."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([csv_cell(value) for value in row])
+
+
+def column_value(obj, path):
+    """Follow a 'customer__user__email' style path; None where a relation is missing."""
+    value = obj
+    for name in path.split('__'):
+        try:
+            value = getattr(value, name)
+        except ObjectDoesNotExist:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+def queryset_csv_lines(queryset, columns, chunk_size=500):
+    """
+    CSV lines for the queryset, one row per object. `columns` is a list of
+    (header, path or callable taking the object) pairs.
+    """
+    def rows():
+        for obj in iter_queryset(queryset, chunk_size):
+            yield [value(obj) if callable(value) else column_value(obj, value) for _, value in columns]
+
+    return csv_lines([header for header, _ in columns], rows())
+
+
+def order_export_lines(orders, fmt):
+    if fmt == 'csv':
+        return csv_lines(ORDER_CSV_COLUMNS, order_csv_rows(orders))
+    return order_ndjson_lines(orders)
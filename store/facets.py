@@ -0,0 +1,144 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+from store.cache import get_catalog_cache, get_catalog_version
+from tags.models import TagCounter, TaggedItem
+
+
+DEFAULT_PRICE_BUCKETS = [0, 10, 25, 50, 100, 250, None]
+# query parameters that change the page but not the result set
+NON_FILTER_PARAMS = {'facets', 'ordering', 'page', 'page_size', 'cursor', 'region', 'format'}
+
+
+def is_filtered(request, view):
+    """Whether any filter or search parameter narrows the view's queryset."""
+    params = set(view.filterset_class.base_filters) | {'search'}
+    return any(request.query_params.get(param) for param in params)
+
+
+def tag_facets(queryset, filtered=True):
+    """
+    [{'id', 'title', 'count'}] of the tags on the products in queryset.
+
+    An unfiltered catalog is answered from the maintained TagCounter rows.
+    A filtered one groups only the tagged rows of the matching products,
+    which the (content_type, object_id, tag) index serves directly.
+    """
+    content_type = ContentType.objects.get_for_model(queryset.model)
+    if not filtered:
+        rows = (
+            TagCounter.objects.filter(content_type=content_type, count__gt=0)
+            .values('tag_id', 'tag__title', 'count')
+        )
+    else:
+        rows = (
+            TaggedItem.objects.filter(content_type=content_type, object_id__in=queryset.order_by().values('pk'))
+            .values('tag_id', 'tag__title')
+            .annotate(count=Count('id'))
+        )
+    facets = [{'id': row['tag_id'], 'title': row['tag__title'], 'count': row['count']} for row in rows]
+    facets.sort(key=lambda facet: (-facet['count'], facet['title']))
+    return facets
+
+
+def price_buckets():
+    edges = getattr(settings, 'STORE_FACETS', {}).get('PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS)
+    return list(zip(edges, edges[1:]))
+
+
+def collection_and_price_facets(queryset, names):
+    """
+    Collection and price bucket counts from one GROUP BY collection query
+    carrying a conditional count per bucket; the price buckets are the
+    column sums of that result.
+    """
+    buckets = price_buckets()
+    counts = {}
+    if 'price' in names:
+        for index, (low, high) in enumerate(buckets):
+            condition = Q(price__gte=low) if low is not None else Q()
+            if high is not None:
+                condition &= Q(price__lt=high)
+            counts[f'bucket_{index}'] = Count('id', filter=condition)
+    rows = list(
+        queryset.order_by()
+        .values('collection_id', 'collection__title')
+        .annotate(count=Count('id'), **counts)
+    )
+
+    facets = {}
+    if 'collection' in names:
+        facets['collection'] = sorted(
+            (
+                {'id': row['collection_id'], 'title': row['collection__title'], 'count': row['count']}
+                for row in rows
+            ),
+            key=lambda facet: (-facet['count'], facet['title'] or ''),
+        )
+    if 'price' in names:
+        facets['price'] = [
+            {'min': low, 'max': high, 'count': sum(row[f'bucket_{index}'] for row in rows)}
+            for index, (low, high) in enumerate(buckets)
+        ]
+    return facets
+
+
+FACETS = ('collection', 'price', 'tag')
+
+
+def requested_facets(request):
+    value = request.query_params.get('facets')
+    if not value:
+        return []
+    names = sorted({name.strip() for name in value.split(',') if name.strip()})
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValidationError({'facets': f'Unknown facet "{unknown[0]}", choose from {", ".join(FACETS)}.'})
+    return names
+
+
+def facet_cache_key(request, names):
+    # every page, ordering and pricing variant of one result set shares its facets
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        if key not in NON_FILTER_PARAMS
+        for value in request.query_params.getlist(key)
+        if value
+    )
+    digest = hashlib.md5(repr((params, names)).encode('utf-8')).hexdigest()
+    return f'store:facets:{get_catalog_version()}:{digest}'
+
+
+class FacetedListMixin:
+    """
+    `?facets=collection,price,tag` adds counts for the filtered result set
+    next to the page. Facets are cached per normalized filter key, so
+    paging through a result set computes them once.
+    """
+
+    def list(self, request, *args, **kwargs):
+        names = requested_facets(request)
+        response = super().list(request, *args, **kwargs)
+        if not names or response.status_code != 200:
+            return response
+
+        cache = get_catalog_cache()
+        key = facet_cache_key(request, names)
+        facets = cache.get(key)
+        if facets is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            facets = collection_and_price_facets(queryset, names) if {'collection', 'price'} & set(names) else {}
+            if 'tag' in names:
+                facets['tag'] = tag_facets(queryset, filtered=is_filtered(request, self))
+            cache.set(key, facets, settings.STORE_CATALOG_CACHE.get('TIMEOUT', 300))
+
+        if isinstance(response.data, list):
+            response.data = {'results': response.data, 'facets': facets}
+        else:
+            response.data['facets'] = facets
+        return response
@@ -1,8 +1,21 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Exists, OuterRef
+from django_filters import BaseInFilter, ChoiceFilter, NumberFilter
 from django_filters.rest_framework import FilterSet
 
 from store.models import Product
+from tags.models import TaggedItem
+
+
+class NumberInFilter(BaseInFilter, NumberFilter):
+    pass
+
 
 class ProductFilter(FilterSet):
+    # ?tag=1,2 matches products with any of the tags, add &tag_match=all to require every one
+    tag = NumberInFilter(method='filter_tag')
+    tag_match = ChoiceFilter(choices=[('any', 'any'), ('all', 'all')], method='filter_tag_match')
+
     class Meta:
         model = Product
         fields = {
@@ -10,4 +23,21 @@ class ProductFilter(FilterSet):
             'price': ['gt', 'lt'],
         }
 
-  
\ No newline at end of file
+    def filter_tag(self, queryset, name, value):
+        tag_ids = sorted({int(tag_id) for tag_id in value})
+        if not tag_ids:
+            return queryset
+        # each EXISTS is an index probe on (content_type, object_id, tag)
+        tagged = TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Product),
+            object_id=OuterRef('pk'),
+        )
+        if self.form.cleaned_data.get('tag_match') == 'all':
+            for tag_id in tag_ids:
+                queryset = queryset.filter(Exists(tagged.filter(tag_id=tag_id)))
+            return queryset
+        return queryset.filter(Exists(tagged.filter(tag_id__in=tag_ids)))
+
+    def filter_tag_match(self, queryset, name, value):
+        # only read by filter_tag
+        return queryset
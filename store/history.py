@@ -0,0 +1,139 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Sum
+
+from store.models import CustomerOrderSummary, CustomerProductSummary, Order, OrderItem
+
+
+AMOUNT = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _locked_summary(customer_id):
+    # the summary row doubles as a per-customer lock, so concurrent updates
+    # of the product rows below never race each other
+    CustomerOrderSummary.objects.get_or_create(customer_id=customer_id)
+    return CustomerOrderSummary.objects.select_for_update().get(customer_id=customer_id)
+
+
+def record_order_created(order):
+    """Count a new order and move the customer's last order date forward."""
+    with transaction.atomic():
+        summary = _locked_summary(order.customer_id)
+        summary.orders_count += 1
+        if summary.last_order_at is None or order.placed_at > summary.last_order_at:
+            summary.last_order_at = order.placed_at
+        summary.save(update_fields=['orders_count', 'last_order_at'])
+
+
+def record_orders_created(orders):
+    """record_order_created for many new orders at once, e.g. after a bulk_create."""
+    counts, latest = {}, {}
+    for order in orders:
+        counts[order.customer_id] = counts.get(order.customer_id, 0) + 1
+        if order.customer_id not in latest or order.placed_at > latest[order.customer_id]:
+            latest[order.customer_id] = order.placed_at
+    if not counts:
+        return
+    with transaction.atomic():
+        CustomerOrderSummary.objects.bulk_create(
+            [CustomerOrderSummary(customer_id=customer_id) for customer_id in counts], ignore_conflicts=True,
+        )
+        summaries = list(
+            CustomerOrderSummary.objects.select_for_update().filter(customer_id__in=counts).order_by('customer_id')
+        )
+        for summary in summaries:
+            summary.orders_count += counts[summary.customer_id]
+            placed_at = latest[summary.customer_id]
+            if summary.last_order_at is None or placed_at > summary.last_order_at:
+                summary.last_order_at = placed_at
+        CustomerOrderSummary.objects.bulk_update(summaries, ['orders_count', 'last_order_at'])
+
+
+def record_payment_status_change(order_id, customer_id, previous, current):
+    """Add or remove the order's items from the spend totals when it becomes or stops being complete."""
+    complete = Order.PAYMENT_STATUS_COMPLETE
+    if (previous == complete) == (current == complete):
+        return
+    sign = 1 if current == complete else -1
+
+    items = (
+        OrderItem.objects.filter(order_id=order_id)
+        .values('product_id')
+        .annotate(units=Sum('quantity'), amount=Sum(F('quantity') * F('price'), output_field=AMOUNT))
+    )
+    with transaction.atomic():
+        summary = _locked_summary(customer_id)
+        totals = {row['product_id']: (row['units'], row['amount']) for row in items}
+        if not totals:
+            return
+        summary.total_spent += sign * sum(amount for _, amount in totals.values())
+        summary.save(update_fields=['total_spent'])
+
+        existing = {
+            row.product_id: row
+            for row in CustomerProductSummary.objects.filter(customer_id=customer_id, product_id__in=totals)
+        }
+        created = []
+        for product_id, (quantity, amount) in totals.items():
+            row = existing.get(product_id)
+            if row is None:
+                if sign > 0:
+                    created.append(CustomerProductSummary(
+                        customer_id=customer_id, product_id=product_id, quantity=quantity, total_spent=amount,
+                    ))
+                continue
+            row.quantity = max(row.quantity + sign * quantity, 0)
+            row.total_spent += sign * amount
+        CustomerProductSummary.objects.bulk_create(created)
+        CustomerProductSummary.objects.bulk_update(existing.values(), ['quantity', 'total_spent'])
+        CustomerProductSummary.objects.filter(customer_id=customer_id, product_id__in=totals, quantity=0).delete()
+
+
+def rebuild_summaries(customer_ids):
+    """Recompute the summaries of the given customers from their orders."""
+    customer_ids = list(customer_ids)
+    orders = (
+        Order.objects.filter(customer_id__in=customer_ids)
+        .order_by()
+        .values('customer_id')
+        .annotate(count=Count('id'), last=Max('placed_at'))
+    )
+    items = OrderItem.objects.filter(
+        order__customer_id__in=customer_ids,
+        order__payment_status=Order.PAYMENT_STATUS_COMPLETE,
+    ).order_by()
+    spent = items.values('order__customer_id').annotate(
+        amount=Sum(F('quantity') * F('price'), output_field=AMOUNT),
+    )
+    products = items.values('order__customer_id', 'product_id').annotate(
+        units=Sum('quantity'),
+        amount=Sum(F('quantity') * F('price'), output_field=AMOUNT),
+    )
+
+    summaries = {
+        customer_id: CustomerOrderSummary(customer_id=customer_id, total_spent=Decimal('0.00'))
+        for customer_id in customer_ids
+    }
+    for row in orders:
+        summary = summaries[row['customer_id']]
+        summary.orders_count = row['count']
+        summary.last_order_at = row['last']
+    for row in spent:
+        summaries[row['order__customer_id']].total_spent = row['amount']
+
+    with transaction.atomic():
+        CustomerOrderSummary.objects.filter(customer_id__in=customer_ids).delete()
+        CustomerProductSummary.objects.filter(customer_id__in=customer_ids).delete()
+        CustomerOrderSummary.objects.bulk_create(summaries.values())
+        CustomerProductSummary.objects.bulk_create(
+            [
+                CustomerProductSummary(
+                    customer_id=row['order__customer_id'], product_id=row['product_id'],
+                    quantity=row['units'], total_spent=row['amount'],
+                )
+                for row in products
+            ],
+            batch_size=1000,
+        )
+    return len(summaries)
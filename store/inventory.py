@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models import F
+
+from store.cache import bump_product_versions
+from store.models import Product
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, quantity):
+        super().__init__(f'Insufficient stock for product {product_id}.')
+        self.product_id = product_id
+        self.quantity = quantity
+
+
+def reserve_inventory(quantities):
+    """
+    Decrement stock for {product_id: quantity} inside the caller's transaction.
+
+    Each product gets one guarded `UPDATE ... SET inventory = inventory - n
+    WHERE id = ? AND inventory >= n`, so no stale read is ever written back.
+    The row lock that UPDATE takes is held until the transaction commits or
+    rolls back, so callers should reserve as late as possible and keep the
+    rest of the transaction short. Products are updated in ascending id order
+    so concurrent checkouts always lock rows in the same order and cannot
+    deadlock. Raises InsufficientStock on the first product that cannot be
+    covered; the surrounding transaction is expected to roll back.
+    """
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        updated = (
+            Product.objects
+            .filter(pk=product_id, inventory__gte=quantity)
+            .update(inventory=F('inventory') - quantity)
+        )
+        if not updated:
+            raise InsufficientStock(product_id, quantity)
+
+    # queryset.update() bypasses post_save, so invalidate the cached payloads
+    # of these products here; the rest of the catalog stays cached
+    product_ids = list(quantities)
+    transaction.on_commit(lambda: bump_product_versions(product_ids))
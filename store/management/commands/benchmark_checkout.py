@@ -0,0 +1,140 @@
+import json
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+
+from store.models import Cart, CartItem, Customer, Order, OrderItem, Product
+from store.serializers import CreateOrderSerializer
+
+
+BENCH_PREFIX = 'bench-checkout'
+
+
+class Command(BaseCommand):
+    help = (
+        'Run many concurrent checkouts against a few hot SKUs and report '
+        'throughput, latency and whether any stock was oversold. Run it against '
+        'MySQL; SQLite serializes writers and reports lock errors under load.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--checkouts', type=int, default=400, help='Total checkout attempts.')
+        parser.add_argument('--skus', type=int, default=3, help='Number of hot products.')
+        parser.add_argument('--inventory', type=int, default=200, help='Initial stock per product.')
+        parser.add_argument('--quantity', type=int, default=1, help='Units of each SKU per cart.')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows afterwards.')
+
+    def handle(self, *args, **options):
+        products, user_ids = self.seed(options)
+        carts = [self.create_cart(products, options['quantity']) for _ in range(options['checkouts'])]
+
+        latencies = []
+        outcomes = {'ok': 0, 'out_of_stock': 0, 'error': 0}
+        errors = Counter()
+        lock = threading.Lock()
+
+        def checkout(index):
+            serializer = CreateOrderSerializer(
+                data={'cart_id': str(carts[index])},
+                context={'user_id': user_ids[index % len(user_ids)]},
+            )
+            started = time.perf_counter()
+            try:
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                outcome = 'ok'
+            except ValidationError:
+                outcome = 'out_of_stock'
+            except Exception as error:
+                outcome = 'error'
+                with lock:
+                    errors[type(error).__name__] += 1
+            finally:
+                connection.close()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                outcomes[outcome] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(checkout, range(len(carts))))
+        wall = time.perf_counter() - started
+
+        sold = sum(
+            OrderItem.objects.filter(product__in=products).values_list('quantity', flat=True)
+        )
+        remaining = sum(Product.objects.filter(pk__in=[p.pk for p in products]).values_list('inventory', flat=True))
+        initial = options['inventory'] * len(products)
+        latencies.sort()
+
+        report = {
+            'threads': options['threads'],
+            'checkouts': len(carts),
+            'outcomes': outcomes,
+            'errors': dict(errors),
+            'wall_seconds': round(wall, 3),
+            'checkouts_per_second': round(len(carts) / wall, 1) if wall else None,
+            'latency_ms': {
+                'p50': round(_percentile(latencies, 50) * 1000, 2),
+                'p95': round(_percentile(latencies, 95) * 1000, 2),
+                'p99': round(_percentile(latencies, 99) * 1000, 2),
+                'mean': round(statistics.fmean(latencies) * 1000, 2),
+            },
+            'units_sold': sold,
+            'units_remaining': remaining,
+            'oversold': sold + remaining != initial or remaining < 0,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if not options['keep']:
+            self.cleanup(products, user_ids)
+
+    def seed(self, options):
+        products = [
+            Product.objects.create(
+                title=f'{BENCH_PREFIX} sku {index}',
+                slug=f'{BENCH_PREFIX}-{index}',
+                price=Decimal('9.99'),
+                inventory=options['inventory'],
+            )
+            for index in range(options['skus'])
+        ]
+        User = get_user_model()
+        user_ids = []
+        for index in range(options['threads']):
+            user = User.objects.create(username=f'{BENCH_PREFIX}-{index}', email=f'{BENCH_PREFIX}-{index}@example.com')
+            Customer.objects.get_or_create(user=user)
+            user_ids.append(user.id)
+        return products, user_ids
+
+    def create_cart(self, products, quantity):
+        cart = Cart.objects.create()
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=product, quantity=quantity) for product in products
+        ])
+        return cart.pk
+
+    def cleanup(self, products, user_ids):
+        orders = Order.objects.filter(customer__user_id__in=user_ids)
+        OrderItem.objects.filter(order__in=orders).delete()
+        orders.delete()
+        Cart.objects.filter(items__product__in=products).delete()
+        Product.objects.filter(pk__in=[p.pk for p in products]).delete()
+        get_user_model().objects.filter(pk__in=user_ids).delete()
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
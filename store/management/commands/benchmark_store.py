@@ -0,0 +1,306 @@
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from urllib import error as urlerror, request as urlrequest
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from store.catalog import refresh_products_count
+from store.management.commands.benchmark_checkout import _percentile
+from store.models import Collection, Customer, Order, OrderItem, Product
+from store.search import rebuild_index
+
+
+WORDS = [
+    'red', 'blue', 'green', 'black', 'classic', 'modern', 'organic', 'wooden', 'steel', 'cotton',
+    'apple', 'coffee', 'chair', 'lamp', 'desk', 'shirt', 'shoe', 'mug', 'table', 'pillow',
+]
+
+DEFAULT_MIX = 'browse=45,search=20,cart_add=15,checkout=5,history=15'
+
+
+class InProcessTransport:
+    """Drives the WSGI stack through django.test.Client, no network involved."""
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'JWT {token}'} if token else {}
+        if method == 'GET':
+            response = self.client.get(path, **headers)
+        else:
+            response = self.client.post(path, data=json.dumps(data), content_type='application/json', **headers)
+        body = response.json() if response.get('Content-Type', '').startswith('application/json') else None
+        return response.status_code, body, response.get('X-DB-Queries')
+
+
+class HttpTransport:
+    """Sends real HTTP requests to a running server (started with the bench settings)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Accept': 'application/json'}
+        payload = None
+        if token:
+            headers['Authorization'] = f'JWT {token}'
+        if data is not None:
+            payload = json.dumps(data).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urlrequest.Request(self.base_url + path, data=payload, headers=headers, method=method)
+        try:
+            with urlrequest.urlopen(req) as response:
+                return response.status, json.loads(response.read() or 'null'), response.headers.get('X-DB-Queries')
+        except urlerror.HTTPError as error:
+            return error.code, None, error.headers.get('X-DB-Queries')
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def __call__(self, transport, label, method, path, data=None, token=None):
+        started = time.perf_counter()
+        status, body, queries = transport.request(method, path, data, token)
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples[label].append((elapsed, status, int(queries) if queries is not None else None))
+        return status, body
+
+
+class Scenarios:
+    """The traffic mix. Each scenario issues one or more labelled requests."""
+
+    def __init__(self, record, products, tokens):
+        self.record = record
+        self.products = products
+        self.tokens = tokens
+
+    def browse(self, transport, rng):
+        self.record(transport, 'products.list', 'GET', '/store/products/?cursor=')
+        self.record(transport, 'products.retrieve', 'GET', f'/store/products/{rng.choice(self.products)}/')
+        self.record(transport, 'collections.list', 'GET', '/store/collections/')
+
+    def search(self, transport, rng):
+        self.record(transport, 'products.search', 'GET', f'/store/products/?cursor=&search={rng.choice(WORDS)}')
+
+    def _fill_cart(self, transport, rng, items):
+        status, cart = self.record(transport, 'carts.create', 'POST', '/store/carts/', {})
+        if status != 201:
+            return None
+        cart_id = cart['customer_id']
+        for product_id in rng.sample(self.products, items):
+            self.record(
+                transport, 'cart_items.create', 'POST', f'/store/carts/{cart_id}/items/',
+                {'product_id': product_id, 'quantity': rng.randint(1, 3)},
+            )
+        return cart_id
+
+    def cart_add(self, transport, rng):
+        cart_id = self._fill_cart(transport, rng, items=2)
+        if cart_id:
+            self.record(transport, 'carts.retrieve', 'GET', f'/store/carts/{cart_id}/')
+
+    def checkout(self, transport, rng):
+        cart_id = self._fill_cart(transport, rng, items=3)
+        if cart_id:
+            self.record(transport, 'orders.create', 'POST', '/store/orders/', {'cart_id': cart_id}, rng.choice(self.tokens))
+
+    def history(self, transport, rng):
+        self.record(transport, 'orders.list', 'GET', '/store/orders/', token=rng.choice(self.tokens))
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a SQLite database at a configurable scale and drive a realistic mix of '
+        '/store/ traffic, reporting req/s, latency percentiles and queries per request '
+        'for each endpoint as JSON. Run with --settings=doocommerce.settings_bench.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--customers', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--reseed', action='store_true', help='Flush and seed again even if data exists.')
+        parser.add_argument('--requests', type=int, default=500, help='Number of scenarios to run.')
+        parser.add_argument('--concurrency', type=int, default=1, help='Client threads.')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Scenario weights, default "{DEFAULT_MIX}".')
+        parser.add_argument('--url', help='Benchmark a running server instead of running in-process.')
+        parser.add_argument('--random-seed', type=int, default=42)
+        parser.add_argument('--output', help='Also write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('benchmark_store seeds its own data; run it with --settings=doocommerce.settings_bench.')
+
+        mix = self.parse_mix(options['mix'])
+        rng = random.Random(options['random_seed'])
+
+        call_command('migrate', verbosity=0, interactive=False)
+        if options['reseed'] or not Product.objects.exists():
+            call_command('flush', verbosity=0, interactive=False)
+            self.seed(options, rng)
+
+        products = list(Product.objects.values_list('id', flat=True))
+        # its own generator, so the picked users don't depend on whether seed() ran
+        user_ids = list(get_user_model().objects.order_by('pk').values_list('pk', flat=True))
+        picked = random.Random(options['random_seed']).sample(user_ids, min(50, len(user_ids)))
+        users = get_user_model().objects.filter(pk__in=picked).order_by('pk')
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+        record = Recorder()
+        scenarios = Scenarios(record, products, tokens)
+
+        plan = rng.choices(list(mix), weights=list(mix.values()), k=options['requests'])
+        wall = self.run(plan, scenarios, options)
+
+        report = self.report(record.samples, wall, options, mix)
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output + '\n')
+
+    def parse_mix(self, value):
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            if not hasattr(Scenarios, name.strip()) or not weight:
+                raise CommandError(f'Unknown scenario in --mix: {part!r}')
+            mix[name.strip()] = float(weight)
+        return mix
+
+    def seed(self, options, rng):
+        started = time.perf_counter()
+        collections = Collection.objects.bulk_create(
+            [Collection(title=f'{word.title()} collection') for word in WORDS]
+        )
+        Product.objects.bulk_create(
+            [
+                Product(
+                    title=f'{rng.choice(WORDS).title()} {rng.choice(WORDS)} {index}',
+                    description=' '.join(rng.choices(WORDS, k=8)),
+                    slug=f'product-{index}',
+                    price=Decimal(rng.randint(100, 50000)) / 100,
+                    inventory=100000,
+                    collection=rng.choice(collections),
+                )
+                for index in range(options['products'])
+            ],
+            batch_size=1000,
+        )
+        rebuild_index()
+        refresh_products_count(Collection.objects.all())
+
+        User = get_user_model()
+        password = make_password('benchmark')
+        users = User.objects.bulk_create(
+            [
+                User(username=f'customer-{index}', email=f'customer-{index}@example.com', password=password)
+                for index in range(options['customers'])
+            ],
+            batch_size=1000,
+        )
+        # bulk_create skips the post_save handler that normally creates customers
+        customers = Customer.objects.bulk_create([Customer(user=user) for user in users], batch_size=1000)
+
+        product_prices = list(Product.objects.values_list('id', 'price'))
+        statuses = [choice for choice, _ in Order.PAYMENT_STATUS_CHOICES]
+        orders = Order.objects.bulk_create(
+            [
+                Order(customer=rng.choice(customers), payment_status=rng.choice(statuses))
+                for _ in range(options['orders'])
+            ],
+            batch_size=1000,
+        )
+        items = []
+        for order in orders:
+            for product_id, price in rng.sample(product_prices, rng.randint(1, 4)):
+                items.append(OrderItem(order=order, product_id=product_id, quantity=rng.randint(1, 3), price=price))
+        OrderItem.objects.bulk_create(items, batch_size=1000)
+
+        self.stderr.write(
+            f'Seeded {options["products"]} products, {options["customers"]} customers and '
+            f'{options["orders"]} orders in {time.perf_counter() - started:.1f}s.'
+        )
+
+    def run(self, plan, scenarios, options):
+        index = iter(range(len(plan)))
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            transport = HttpTransport(options['url']) if options['url'] else InProcessTransport()
+            while True:
+                with lock:
+                    position = next(index, None)
+                if position is None:
+                    break
+                getattr(scenarios, plan[position])(transport, rng)
+            connection.close()
+
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=worker, args=(options['random_seed'] + number,))
+            for number in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def report(self, samples, wall, options, mix):
+        endpoints = {}
+        total = 0
+        for label in sorted(samples):
+            entries = samples[label]
+            latencies = sorted(elapsed for elapsed, _, _ in entries)
+            queries = [count for _, _, count in entries if count is not None]
+            statuses = defaultdict(int)
+            for _, status, _ in entries:
+                statuses[str(status)] += 1
+            total += len(entries)
+            endpoints[label] = {
+                'requests': len(entries),
+                'errors': sum(1 for _, status, _ in entries if status >= 400),
+                'statuses': dict(statuses),
+                'req_per_s': round(len(entries) / wall, 2) if wall else None,
+                'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+                'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+                'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+                'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+            }
+        return {
+            'commit': _git_commit(),
+            'target': options['url'] or 'in-process',
+            'scale': {key: options[key] for key in ('products', 'customers', 'orders')},
+            'scenarios': options['requests'],
+            'concurrency': options['concurrency'],
+            'mix': mix,
+            'wall_seconds': round(wall, 3),
+            'total_requests': total,
+            'req_per_s': round(total / wall, 2) if wall else None,
+            'endpoints': endpoints,
+        }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
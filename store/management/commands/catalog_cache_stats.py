@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.cache import catalog_cache_stats, get_catalog_cache, is_shared_cache, reset_catalog_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the product and collection catalog cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them.')
+
+    def handle(self, *args, **options):
+        # the counters live in the serving processes' cache, which this
+        # process cannot see unless the cache is shared
+        if not is_shared_cache(get_catalog_cache()):
+            raise CommandError(
+                'The catalog cache is local to each process, so its counters are not visible here. '
+                "Set REDIS_URL or point STORE_CATALOG_CACHE['ALIAS'] at a shared cache."
+            )
+        stats = catalog_cache_stats()
+        self.stdout.write(f"version:   {stats['version']}")
+        self.stdout.write(f"hits:      {stats['hits']}")
+        self.stdout.write(f"misses:    {stats['misses']}")
+        self.stdout.write(f"hit ratio: {stats['hit_ratio']:.2%}")
+        if options['reset']:
+            reset_catalog_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -0,0 +1,39 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand
+
+from store.catalog import CATALOG_COLUMNS, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream the product catalog to CSV or NDJSON with bounded memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument('--output', default='-', help="Output file, or '-' for stdout.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        stream = self.stdout if output == '-' else open(output, 'w', newline='', encoding='utf-8')
+        try:
+            count = self.write(stream, options['format'], export_rows(options['chunk_size']))
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+        self.stderr.write(f'Exported {count} products.')
+
+    def write(self, stream, fmt, rows):
+        count = 0
+        if fmt == 'csv':
+            writer = csv.DictWriter(stream, fieldnames=CATALOG_COLUMNS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                stream.write(json.dumps(row, default=str) + '\n')
+                count += 1
+        return count
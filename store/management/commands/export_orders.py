@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.exports import filter_orders, iter_orders, order_export_lines, parse_boundary
+from store.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Stream orders with their items to NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--output', default='-', help="Output file, or '-' for stdout.")
+        parser.add_argument('--placed-after', help='ISO date or datetime, inclusive.')
+        parser.add_argument('--placed-before', help='ISO date or datetime, inclusive.')
+        parser.add_argument('--payment-status', choices=[choice for choice, _ in Order.PAYMENT_STATUS_CHOICES])
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        boundaries = {}
+        for name, end_of_day in [('placed_after', False), ('placed_before', True)]:
+            value = options[name]
+            if value is None:
+                continue
+            boundaries[name] = parse_boundary(value, end_of_day=end_of_day)
+            if boundaries[name] is None:
+                raise CommandError(f"Invalid date for --{name.replace('_', '-')}: {value}")
+
+        orders = filter_orders(Order.objects.all(), payment_status=options['payment_status'], **boundaries)
+        lines = order_export_lines(iter_orders(orders, options['chunk_size']), options['format'])
+
+        output = options['output']
+        stream = self.stdout if output == '-' else open(output, 'w', newline='', encoding='utf-8')
+        try:
+            for line in lines:
+                stream.write(line)
+        finally:
+            if stream is not self.stdout:
+                stream.close()
@@ -0,0 +1,77 @@
+import csv
+import json
+import sys
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.cache import bump_catalog_version
+from store.catalog import CatalogRowError, import_chunk, parse_row, refresh_products_count
+from store.models import Collection
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream-import products from a CSV or NDJSON file, upserting on slug. '
+        'Columns: slug, title, description, price, inventory, collection (title).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if path == '-' and not options['format']:
+            raise CommandError('--format is required when reading from stdin.')
+
+        self.skipped = 0
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            created, updated, collections = self.run(stream, fmt, options['chunk_size'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        # bulk writes bypass the Product signal handlers
+        refresh_products_count(Collection.objects.filter(pk__in=collections))
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported catalog: {created} created, {updated} updated, {self.skipped} skipped.'
+        ))
+
+    def run(self, stream, fmt, chunk_size):
+        created = updated = 0
+        collections = set()
+        rows = self.parsed_rows(self.read(stream, fmt))
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            chunk_created, chunk_updated, touched = import_chunk(chunk)
+            created += chunk_created
+            updated += chunk_updated
+            collections |= touched
+            self.stdout.write(f'... {created + updated} rows imported')
+        return created, updated, collections
+
+    def read(self, stream, fmt):
+        if fmt == 'csv':
+            yield from enumerate(csv.DictReader(stream), start=2)
+            return
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, {}
+
+    def parsed_rows(self, numbered_rows):
+        for line_number, row in numbered_rows:
+            try:
+                yield parse_row(row)
+            except CatalogRowError as error:
+                self.skipped += 1
+                self.stderr.write(f'line {line_number}: {error}')
@@ -0,0 +1,41 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from store.outbox import claim_batch, dispatch, record_results
+
+
+class Command(BaseCommand):
+    help = 'Dispatch pending outbox events (e.g. order_created) to their receivers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Receiver threads.')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when idle.')
+        parser.add_argument('--lease', type=int, default=300, help='Seconds before a claimed event may be reclaimed.')
+        parser.add_argument('--max-attempts', type=int, default=8)
+        parser.add_argument('--backoff', type=float, default=5.0, help='Base retry delay in seconds.')
+        parser.add_argument('--max-backoff', type=float, default=3600.0)
+        parser.add_argument('--once', action='store_true', help='Process a single batch and exit.')
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                events = claim_batch(options['batch_size'], options['lease'])
+                if not events:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                results = list(zip(events, pool.map(dispatch, events)))
+                done, failed = record_results(
+                    results,
+                    max_attempts=options['max_attempts'],
+                    base_seconds=options['backoff'],
+                    max_seconds=options['max_backoff'],
+                )
+                self.stdout.write(f'Dispatched {done} events, {failed} failed.')
+                if options['once']:
+                    break
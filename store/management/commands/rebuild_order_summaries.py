@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from store.history import rebuild_summaries
+from store.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Recompute the customer order and product summaries behind the customer history endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customer', type=int, action='append', help='Only rebuild these customers.')
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if options['customer']:
+            rebuilt = rebuild_summaries(options['customer'])
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} customer summaries.'))
+            return
+
+        chunk_size = options['chunk_size']
+        rebuilt = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                Customer.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not pks:
+                break
+            rebuilt += rebuild_summaries(pks)
+            last_pk = pks[-1]
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} customer summaries.'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from store.catalog import refresh_products_count
+from store.models import Collection
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored products_count of every collection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                Collection.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not pks:
+                break
+            updated += refresh_products_count(Collection.objects.filter(pk__in=pks))
+            last_pk = pks[-1]
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {updated} collections.'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from store.carts import refresh_cart_totals, snapshot_missing_prices
+from store.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored cart item counts and subtotals from cart items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        snapped = snapshot_missing_prices(CartItem.objects.all())
+        if snapped:
+            self.stdout.write(f'Snapshotted prices for {snapped} cart items.')
+
+        repaired = 0
+        last_pk = None
+        while True:
+            carts = Cart.objects.order_by('pk')
+            if last_pk is not None:
+                carts = carts.filter(pk__gt=last_pk)
+            pks = list(carts.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            repaired += refresh_cart_totals(Cart.objects.filter(pk__in=pks))
+            last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed totals for {repaired} carts.'))
@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from store.carts import sweep_carts
+from store.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned carts, with their items, created more than --days ago.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=30, help='Minimum cart age in days.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0.5, help='Seconds to pause between batches.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the carts that would be deleted.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must not be negative and --batch-size must be positive.')
+        created_before = timezone.now() - timedelta(days=options['days'])
+
+        if options['dry_run']:
+            count = Cart.objects.filter(created_at__lt=created_before).count()
+            self.stdout.write(f'{count} carts created before {created_before:%Y-%m-%d %H:%M} would be deleted.')
+            return
+
+        carts = items = batches = 0
+        started = time.monotonic()
+        for deleted_carts, deleted_items in sweep_carts(created_before, options['batch_size']):
+            carts += deleted_carts
+            items += deleted_items
+            batches += 1
+            self.stdout.write(f'Batch {batches}: deleted {deleted_carts} carts and {deleted_items} items ({carts} carts so far).')
+            if deleted_carts == options['batch_size'] and options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {carts} carts and {items} items created before {created_before:%Y-%m-%d %H:%M} '
+            f'in {batches} batches ({time.monotonic() - started:.1f}s).'
+        ))
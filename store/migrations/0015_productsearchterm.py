@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from store.search import term_weights
+
+
+def backfill_search_terms(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    ProductSearchTerm = apps.get_model('store', 'ProductSearchTerm')
+
+    terms = []
+    for product in Product.objects.only('id', 'title', 'description').order_by('pk').iterator(chunk_size=1000):
+        terms.extend(
+            ProductSearchTerm(term=term, product_id=product.pk, weight=weight)
+            for term, weight in term_weights(product).items()
+        )
+        if len(terms) >= 1000:
+            ProductSearchTerm.objects.bulk_create(terms)
+            terms = []
+    ProductSearchTerm.objects.bulk_create(terms)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='store.product')),
+            ],
+            options={
+                'unique_together': {('term', 'product')},
+            },
+        ),
+        migrations.RunPython(backfill_search_terms, migrations.RunPython.noop),
+    ]
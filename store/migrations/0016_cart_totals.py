@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:48
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    Product = apps.get_model('store', 'Product')
+
+    CartItem.objects.filter(price__isnull=True).update(
+        price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1])
+    )
+    items = CartItem.objects.filter(cart_id=OuterRef('pk')).order_by().values('cart_id')
+    Cart.objects.update(
+        items_count=Coalesce(
+            Subquery(items.annotate(total=Sum('quantity')).values('total'), output_field=models.IntegerField()),
+            Value(0),
+        ),
+        subtotal=Coalesce(
+            Subquery(
+                items.annotate(total=Sum(F('quantity') * F('price'))).values('total'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_productsearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_products_count(apps, schema_editor):
+    Collection = apps.get_model('store', 'Collection')
+    Product = apps.get_model('store', 'Product')
+
+    counts = (
+        Product.objects.filter(collection_id=OuterRef('pk'))
+        .order_by()
+        .values('collection_id')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Collection.objects.update(
+        products_count=Coalesce(Subquery(counts, output_field=models.IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='products_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_products_count, migrations.RunPython.noop),
+    ]
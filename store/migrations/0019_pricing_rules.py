@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:59
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_collection_products_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MembershipDiscount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('membership', models.CharField(choices=[('B', 'Bronze'), ('S', 'Silver'), ('G', 'Gold')], max_length=1, unique=True)),
+                ('percent', models.DecimalField(decimal_places=2, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaxRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(blank=True, help_text='Upper case region code, empty for any region.', max_length=32)),
+                ('rate', models.DecimalField(decimal_places=4, help_text='0.1000 is 10%.', max_digits=5, validators=[django.core.validators.MinValueValidator(0)])),
+                ('collection', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tax_rules', to='store.collection')),
+            ],
+            options={
+                'unique_together': {('region', 'collection')},
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Sum
+
+
+def backfill_summaries(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    CustomerOrderSummary = apps.get_model('store', 'CustomerOrderSummary')
+    CustomerProductSummary = apps.get_model('store', 'CustomerProductSummary')
+
+    def amount():
+        return Sum(F('quantity') * F('price'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+
+    summaries = {
+        row['customer_id']: CustomerOrderSummary(
+            customer_id=row['customer_id'], orders_count=row['count'], last_order_at=row['last'], total_spent=0,
+        )
+        for row in Order.objects.order_by().values('customer_id').annotate(count=Count('id'), last=Max('placed_at'))
+    }
+    completed = OrderItem.objects.filter(order__payment_status='C').order_by()
+    for row in completed.values('order__customer_id').annotate(amount=amount()):
+        summaries[row['order__customer_id']].total_spent = row['amount']
+    CustomerOrderSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+    CustomerProductSummary.objects.bulk_create(
+        (
+            CustomerProductSummary(
+                customer_id=row['order__customer_id'], product_id=row['product_id'],
+                quantity=row['units'], total_spent=row['amount'],
+            )
+            for row in completed.values('order__customer_id', 'product_id').annotate(
+                units=Sum('quantity'), amount=amount(),
+            )
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_pricing_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerOrderSummary',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_summary', serialize=False, to='store.customer')),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomerProductSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'placed_at', 'id'], name='order_customer_placed_idx'),
+        ),
+        migrations.AddField(
+            model_name='customerproductsummary',
+            name='customer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_summaries', to='store.customer'),
+        ),
+        migrations.AddField(
+            model_name='customerproductsummary',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.product'),
+        ),
+        migrations.AddIndex(
+            model_name='customerproductsummary',
+            index=models.Index(fields=['customer', '-quantity'], name='customer_product_qty_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='customerproductsummary',
+            unique_together={('customer', 'product')},
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_customer_order_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='reference',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_order_reference'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['created_at', 'customer_id'], name='cart_created_idx'),
+        ),
+    ]
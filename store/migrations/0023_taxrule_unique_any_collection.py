@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0022_cart_created_index'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='taxrule',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='taxrule',
+            constraint=models.UniqueConstraint(fields=('region', 'collection'), name='store_taxrule_unique_region_collection'),
+        ),
+        migrations.AddConstraint(
+            model_name='taxrule',
+            constraint=models.UniqueConstraint(condition=models.Q(('collection__isnull', True)), fields=('region',), name='store_taxrule_unique_region_any_collection'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_taxrule_unique_any_collection'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['placed_at', 'id'], name='order_placed_idx'),
+        ),
+    ]
@@ -1,12 +1,15 @@
 from django.db import models
-from django.core.validators import MinValueValidator
+from django.core.validators import MaxValueValidator, MinValueValidator
 from uuid import uuid4
 from django.conf import settings
+from django.utils import timezone
 
 # Create your models here.
 class Collection(models.Model):
     title = models.CharField(max_length=255)
     featured_product = models.ForeignKey('Product', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # maintained by the Product signal handlers, see store.catalog
+    products_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
@@ -36,10 +39,26 @@ class Product(models.Model):
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
         app_label = 'store'
+        # composite keys used by keyset (cursor) pagination
+        indexes = [
+            models.Index(fields=['title', 'id'], name='product_title_id_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['last_update', 'id'], name='product_last_update_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+class ProductSearchTerm(models.Model):
+    # inverted index over product title/description, maintained on save
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ['term', 'product']
+
+
 class Customer(models.Model):
     MEMBERSHIP_BRONZE = 'B'
     MEMBERSHIP_SILVER = 'S'
@@ -66,6 +85,39 @@ class Customer(models.Model):
             ('view_history', 'Can view history')
         ]
 
+class TaxRule(models.Model):
+    # an empty region or collection matches any, see store.pricing.Pricer
+    region = models.CharField(max_length=32, blank=True, help_text='Upper case region code, empty for any region.')
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE, null=True, blank=True, related_name='tax_rules')
+    rate = models.DecimalField(max_digits=5, decimal_places=4, validators=[MinValueValidator(0)], help_text='0.1000 is 10%.')
+
+    def save(self, *args, **kwargs):
+        self.region = self.region.upper()
+        super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return f'{self.region or "*"} / {self.collection or "*"}: {self.rate}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['region', 'collection'], name='store_taxrule_unique_region_collection'),
+            # NULLs are distinct in the constraint above, so one rule per region
+            # for any collection needs its own; MySQL ignores the condition and
+            # relies on model validation (the admin) instead
+            models.UniqueConstraint(
+                fields=['region'], condition=models.Q(collection__isnull=True), name='store_taxrule_unique_region_any_collection',
+            ),
+        ]
+
+
+class MembershipDiscount(models.Model):
+    membership = models.CharField(max_length=1, choices=Customer.MEMBERSHIP_CHOICES, unique=True)
+    percent = models.DecimalField(max_digits=5, decimal_places=2, validators=[MinValueValidator(0), MaxValueValidator(100)])
+
+    def __str__(self) -> str:
+        return f'{self.get_membership_display()}: {self.percent}%'
+
+
 class Order(models.Model):
     PAYMENT_STATUS_PENDING = 'P'
     PAYMENT_STATUS_COMPLETE = 'C'
@@ -79,6 +131,9 @@ class Order(models.Model):
     # one customer can have many orders (order_set)
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
     payment_status = models.CharField(max_length=1, choices=PAYMENT_STATUS_CHOICES, default=PAYMENT_STATUS_PENDING)
+    # set on orders created in bulk so their ids can be read back on
+    # backends where bulk_create doesn't return them (MySQL), see store.checkout
+    reference = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     class Meta:
         verbose_name = 'Order'
@@ -88,6 +143,12 @@ class Order(models.Model):
         permissions = [
             ('cancel_order', 'Can cancel order')
         ]
+        indexes = [
+            # a customer's orders newest first, see the customer history endpoint
+            models.Index(fields=['customer', 'placed_at', 'id'], name='order_customer_placed_idx'),
+            # date ranges of the order exports, see store.exports.filter_orders
+            models.Index(fields=['placed_at', 'id'], name='order_placed_idx'),
+        ]
 
     
 class OrderItem(models.Model):
@@ -100,9 +161,42 @@ class OrderItem(models.Model):
     quantity = models.PositiveSmallIntegerField()
     price = models.DecimalField(max_digits=6, decimal_places=2)
 
+class CustomerOrderSummary(models.Model):
+    # maintained incrementally by the Order signal handlers and store.checkout,
+    # see store.history;
+    # spend only counts orders whose payment is complete
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='order_summary')
+    orders_count = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_order_at = models.DateTimeField(null=True, blank=True)
+
+
+class CustomerProductSummary(models.Model):
+    # per-product totals over the customer's completed orders
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='product_summaries')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['customer', 'product']
+        indexes = [
+            models.Index(fields=['customer', '-quantity'], name='customer_product_qty_idx'),
+        ]
+
+
 class Cart(models.Model):
     customer_id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # maintained on every cart item write, see store.carts
+    items_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            # abandoned carts oldest first, see store.carts.sweep_carts
+            models.Index(fields=['created_at', 'customer_id'], name='cart_created_idx'),
+        ]
 
 class CartItem(models.Model):
     # one cart can have many cart item
@@ -110,6 +204,7 @@ class CartItem(models.Model):
     # one product can be in many cart item
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)])
+    # unit price snapshotted when the product is first added to the cart
     price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
 
     class Meta:
@@ -131,4 +226,37 @@ class Review(models.Model):
     date = models.DateField(auto_now_add=True)
 
 
-# class 
\ No newline at end of file
+# class
+
+
+class OutboxEvent(models.Model):
+    # events written in the same transaction as the change that caused them
+    # and dispatched later by the process_outbox worker
+    STATUS_PENDING = 'P'
+    STATUS_PROCESSING = 'R'
+    STATUS_DONE = 'D'
+    STATUS_FAILED = 'F'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed')
+    ]
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.UUIDField(null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self) -> str:
+        return f'{self.topic} #{self.pk}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ]
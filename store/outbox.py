@@ -0,0 +1,123 @@
+import traceback
+from datetime import timedelta
+from uuid import uuid4
+
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from store.models import Order, OutboxEvent
+from store.signals import order_created
+
+
+def enqueue(topic, payload):
+    """Record an event; call inside the transaction that produced it."""
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def enqueue_many(topic, payloads, batch_size=None):
+    """enqueue() for many events of one topic, in as few INSERTs as batch_size allows."""
+    return OutboxEvent.objects.bulk_create(
+        [OutboxEvent(topic=topic, payload=payload) for payload in payloads], batch_size=batch_size,
+    )
+
+
+def _dispatch_order_created(payload):
+    order = Order.objects.get(pk=payload['order_id'])
+    return order_created.send_robust(sender=Order, order=order)
+
+
+DISPATCHERS = {
+    'order_created': _dispatch_order_created,
+}
+
+
+def claim_batch(batch_size, lease_seconds):
+    """
+    Atomically claim up to `batch_size` due events for this worker.
+
+    Due means pending and available, or stuck in processing after its lease
+    expired (a worker died mid-batch). Rows are locked with SKIP LOCKED where
+    the backend supports it so concurrent workers take disjoint batches; the
+    claim token guards backends without row locks.
+    """
+    now = timezone.now()
+    token = uuid4()
+    due = (
+        Q(status=OutboxEvent.STATUS_PENDING, available_at__lte=now)
+        | Q(status=OutboxEvent.STATUS_PROCESSING, locked_until__lt=now)
+    )
+    with transaction.atomic():
+        ids = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        OutboxEvent.objects.filter(due, pk__in=ids).update(
+            status=OutboxEvent.STATUS_PROCESSING,
+            claim_token=token,
+            locked_until=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+        )
+    return list(OutboxEvent.objects.filter(claim_token=token).order_by('id'))
+
+
+def dispatch(event):
+    """Run the receivers for one event; returns an error string or None."""
+    close_old_connections()
+    try:
+        dispatcher = DISPATCHERS[event.topic]
+        results = dispatcher(event.payload)
+    except Exception:
+        return traceback.format_exc()
+    errors = [
+        f'{getattr(receiver, "__qualname__", receiver)}: {response!r}'
+        for receiver, response in results
+        if isinstance(response, Exception)
+    ]
+    return '\n'.join(errors) or None
+
+
+def backoff(attempts, base_seconds, max_seconds):
+    return min(base_seconds * 2 ** max(attempts - 1, 0), max_seconds)
+
+
+def record_results(results, max_attempts, base_seconds, max_seconds):
+    """
+    Persist [(event, error_or_None)] for events of one claim_batch().
+
+    Updates match the claim token too: an event whose lease expired and was
+    claimed again by another worker now belongs to that worker, so the stale
+    result is dropped. Returns the (done, failed) rows actually written.
+    """
+    now = timezone.now()
+    done_ids = [event.pk for event, error in results if error is None]
+    done = 0
+    if done_ids:
+        done = OutboxEvent.objects.filter(pk__in=done_ids, claim_token=results[0][0].claim_token).update(
+            status=OutboxEvent.STATUS_DONE,
+            processed_at=now,
+            locked_until=None,
+            last_error='',
+        )
+
+    failed = 0
+    for event, error in results:
+        if error is None:
+            continue
+        if event.attempts >= max_attempts:
+            status, available_at = OutboxEvent.STATUS_FAILED, event.available_at
+        else:
+            status = OutboxEvent.STATUS_PENDING
+            available_at = now + timedelta(seconds=backoff(event.attempts, base_seconds, max_seconds))
+        failed += OutboxEvent.objects.filter(pk=event.pk, claim_token=event.claim_token).update(
+            status=status,
+            available_at=available_at,
+            processed_at=now,
+            locked_until=None,
+            last_error=error,
+        )
+    return done, failed
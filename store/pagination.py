@@ -0,0 +1,189 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+KeysetCursor = namedtuple('KeysetCursor', ['position', 'reverse'])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over a composite (ordering field, id) key.
+
+    DRF's CursorPagination only keys on the first ordering field and falls
+    back to OFFSET for ties, which degrades on non-unique columns such as
+    `title` or `price`. Here the cursor carries the full key of the boundary
+    row, so every page is a single indexed range scan with no COUNT query.
+    """
+    ordering = ('title',)
+    tiebreaker = 'id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+
+        if self.cursor is not None:
+            try:
+                queryset = queryset.filter(self._after(queryset.model, ordering, self.cursor.position))
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = [field for field in super().get_ordering(request, queryset, view)
+                    if field.lstrip('-') != self.tiebreaker]
+        # The tiebreaker follows the direction of the leading field so the
+        # composite key maps onto a single index range.
+        direction = '-' if ordering and ordering[0].startswith('-') else ''
+        return tuple(ordering) + (direction + self.tiebreaker,)
+
+    def _after(self, model, ordering, position):
+        # Lexicographic "row comes after position": (a > x) OR (a = x AND b > y) ...
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            value = model._meta.get_field(name).to_python(value)
+            condition |= Q(**equal, **{name + lookup: value})
+            equal[name] = value
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            name = field.lstrip('-')
+            attr = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            position.append(str(attr))
+        return position
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            payload = json.loads(urlsafe_b64decode((encoded + padding).encode('ascii')))
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+            ordering = payload['o']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor is only meaningful for the ordering it was issued under.
+        if ordering != list(self.ordering) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return KeysetCursor(position=position, reverse=reverse)
+
+    def encode_cursor(self, cursor):
+        payload = {'p': cursor.position, 'o': list(self.ordering)}
+        if cursor.reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('ascii'))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode('ascii').rstrip('='))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(KeysetCursor(position=position, reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(KeysetCursor(position=position, reverse=True))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class OrderHistoryPagination(KeysetPagination):
+    ordering = ('-placed_at',)
+
+
+def estimated_row_count(model, using='default'):
+    """
+    The table's row count from the database statistics (MySQL, PostgreSQL),
+    or None where there are none. Cheap but only approximately right.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 for tables that were never analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists over large tables.
+
+    Unfiltered lists take their count from the table statistics once the
+    table holds more than `exact_count_limit` rows. Filtered lists count at
+    most `exact_count_limit` rows, as do unfiltered lists on databases
+    without statistics, so no count ever scans the table; past the limit the
+    changelist shows the limit and the filter needs narrowing.
+    """
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.exact_count_limit:
+                return estimate
+        return queryset.order_by()[:self.exact_count_limit].count()
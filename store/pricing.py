@@ -0,0 +1,145 @@
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+from store.cache import bump_version, get_catalog_cache, get_version
+from store.customers import get_customer
+from store.models import MembershipDiscount, TaxRule
+
+
+PRICING_VERSION_KEY = 'store:pricing:version'
+CENT = Decimal('0.01')
+HUNDRED = Decimal(100)
+
+ProductPrice = namedtuple('ProductPrice', ['unit_price', 'price_with_tax'])
+
+# compiled rules of the current process, reused while the version matches
+_compiled = (None, None)
+
+
+def pricing_settings():
+    config = {'DEFAULT_TAX_RATE': '0.10', 'DEFAULT_REGION': '', 'REGION_QUERY_PARAM': 'region'}
+    config.update(getattr(settings, 'STORE_PRICING', {}))
+    return config
+
+
+def quantize(amount):
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def bump_pricing_version():
+    return bump_version(PRICING_VERSION_KEY)
+
+
+def compile_rules():
+    """
+    Load all tax rules and membership discounts into plain dicts:
+    {'taxes': {region: {collection_id or None: rate}}, 'discounts': {membership: percent}}.
+    """
+    taxes = {}
+    for region, collection_id, rate in TaxRule.objects.values_list('region', 'collection_id', 'rate'):
+        taxes.setdefault(region, {})[collection_id] = rate
+    discounts = dict(MembershipDiscount.objects.values_list('membership', 'percent'))
+    return {'taxes': taxes, 'discounts': discounts}
+
+
+def get_rules():
+    global _compiled
+    version = get_version(PRICING_VERSION_KEY)
+    if _compiled[0] == version:
+        return _compiled[1]
+    cache = get_catalog_cache()
+    key = f'store:pricing:{version}:rules'
+    rules = cache.get(key)
+    if rules is None:
+        rules = compile_rules()
+        cache.set(key, rules, None)
+    _compiled = (version, rules)
+    return rules
+
+
+class Pricer:
+    """
+    Prices products for one region and membership tier.
+
+    The tax rate of a product is the most specific rule that matches:
+    (region, collection), (region, any collection), (any region, collection),
+    (any region, any collection), then STORE_PRICING['DEFAULT_TAX_RATE'].
+    The membership discount applies before tax. Results are rounded half up
+    to cents.
+    """
+
+    def __init__(self, region=None, membership=None, rules=None):
+        config = pricing_settings()
+        rules = rules if rules is not None else get_rules()
+        self.region = (region or config['DEFAULT_REGION']).upper()
+        self.membership = membership
+        self.default_rate = Decimal(config['DEFAULT_TAX_RATE'])
+        self._tables = [rules['taxes'].get(self.region, {}), rules['taxes'].get('', {})]
+        percent = rules['discounts'].get(membership) or Decimal(0)
+        self._discount = (HUNDRED - percent) / HUNDRED
+        self._rates = {}
+
+    @property
+    def key(self):
+        """Identifies everything a price depends on besides the product."""
+        return f'{self.region}:{self.membership or ""}'
+
+    def tax_rate(self, collection_id):
+        rate = self._rates.get(collection_id)
+        if rate is None:
+            rate = self.default_rate
+            for table in self._tables:
+                match = table.get(collection_id, table.get(None))
+                if match is not None:
+                    rate = match
+                    break
+            self._rates[collection_id] = rate
+        return rate
+
+    def unit_price(self, price):
+        return quantize(price * self._discount)
+
+    def price(self, price, collection_id):
+        unit_price = self.unit_price(price)
+        return ProductPrice(unit_price, quantize(unit_price * (1 + self.tax_rate(collection_id))))
+
+    def price_products(self, products):
+        """{product id: ProductPrice} for products (instances or dicts)."""
+        prices = {}
+        for product in products:
+            if isinstance(product, dict):
+                prices[product['id']] = self.price(product['price'], product.get('collection_id'))
+            else:
+                prices[product.pk] = self.price(product.price, product.collection_id)
+        return prices
+
+
+def request_region(request):
+    return request.GET.get(pricing_settings()['REGION_QUERY_PARAM'], '')[:32]
+
+
+def pricer_for_request(request):
+    """The request's Pricer: region from the query string, tier from the customer."""
+    pricer = getattr(request, '_store_pricer', None)
+    if pricer is None:
+        customer = get_customer(request)
+        pricer = Pricer(region=request_region(request), membership=customer.membership if customer else None)
+        request._store_pricer = pricer
+    return pricer
+
+
+def pricer_for_customer(customer, request=None):
+    """
+    The Pricer for writes on behalf of customer: like pricer_for_request,
+    but with the tier of the given (freshly loaded) Customer.
+    """
+    return Pricer(region=request_region(request) if request is not None else None, membership=customer.membership)
+
+
+def pricer_from_context(context):
+    request = context.get('request')
+    if request is not None:
+        return pricer_for_request(request)
+    return Pricer(membership=context.get('membership'))
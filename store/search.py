@@ -0,0 +1,105 @@
+import re
+from collections import Counter
+
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+from rest_framework.filters import SearchFilter
+
+from store.models import Product, ProductSearchTerm
+
+
+TOKEN_RE = re.compile(r'\w+')
+FIELD_WEIGHTS = {'title': 3, 'description': 1}
+MAX_TERM_LENGTH = 64
+MIN_PREFIX_LENGTH = 2
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.lower())]
+
+
+def term_weights(product):
+    """{term: weight} for a product; only reads the fields in FIELD_WEIGHTS."""
+    weights = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in tokenize(getattr(product, field)):
+            weights[term] += weight
+    return weights
+
+
+def _terms_for(product):
+    return [ProductSearchTerm(term=term, product_id=product.pk, weight=weight)
+            for term, weight in term_weights(product).items()]
+
+
+def index_product(product):
+    ProductSearchTerm.objects.filter(product_id=product.pk).delete()
+    ProductSearchTerm.objects.bulk_create(_terms_for(product))
+
+
+def rebuild_index(queryset=None, chunk_size=1000):
+    """Reindex products in chunks; returns the number of products indexed."""
+    queryset = (queryset if queryset is not None else Product.objects.all()).only('id', 'title', 'description')
+    indexed = 0
+    chunk = []
+    for product in queryset.order_by('pk').iterator(chunk_size=chunk_size):
+        chunk.append(product)
+        if len(chunk) == chunk_size:
+            indexed += _reindex_chunk(chunk)
+            chunk = []
+    if chunk:
+        indexed += _reindex_chunk(chunk)
+    return indexed
+
+
+def _reindex_chunk(products):
+    ProductSearchTerm.objects.filter(product_id__in=[product.pk for product in products]).delete()
+    ProductSearchTerm.objects.bulk_create(
+        [term for product in products for term in _terms_for(product)],
+        batch_size=1000,
+    )
+    return len(products)
+
+
+def term_lookup(term):
+    if len(term) < MIN_PREFIX_LENGTH:
+        return Q(term=term)
+    # A half-open range instead of LIKE 'term%' so the (term, product) index
+    # is used regardless of the backend's LIKE/collation rules.
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return Q(term__gte=term, term__lt=upper)
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    Ranked prefix search backed by the ProductSearchTerm inverted index.
+
+    Every search term must match (AND); exact term matches rank above prefix
+    matches and title hits above description hits. Results are ordered by
+    relevance unless an explicit ?ordering= is given.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = tokenize(' '.join(self.get_search_terms(request)))
+        if not terms:
+            return queryset
+
+        matches = Q()
+        for term in terms:
+            lookup = term_lookup(term)
+            queryset = queryset.filter(pk__in=ProductSearchTerm.objects.filter(lookup).values('product_id'))
+            matches |= lookup
+
+        rank = (
+            ProductSearchTerm.objects
+            .filter(matches, product_id=OuterRef('pk'))
+            .values('product_id')
+            .annotate(rank=Sum(Case(
+                When(term__in=terms, then=F('weight') * 2),
+                default=F('weight'),
+                output_field=IntegerField(),
+            )))
+            .values('rank')
+        )
+        return queryset.annotate(search_rank=Subquery(rank)).order_by('-search_rank', 'pk')
@@ -1,9 +1,12 @@
 from rest_framework import serializers
-from store.models import Cart, CartItem, Product, Collection, Customer,  Review, Order, OrderItem
-from decimal import Decimal
+from store.models import Cart, CartItem, Product, Collection, Customer, CustomerOrderSummary, CustomerProductSummary, Review, Order, OrderItem
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from .signals import order_created
+from .carts import add_cart_items, adjust_cart_totals, refresh_cart_totals
+from .checkout import batch_order_settings, place_orders
+from .inventory import InsufficientStock, reserve_inventory
+from .outbox import enqueue
+from .pricing import pricer_for_customer, pricer_from_context
 
 
 
@@ -15,15 +18,29 @@ class CollectionSerializer(serializers.ModelSerializer):
     products_count = serializers.IntegerField(read_only=True)
 
 
+class ProductListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # price the whole page with one set of compiled rules up front
+        products = list(data.all() if hasattr(data, 'all') else data)
+        self.child.prices = pricer_from_context(self.context).price_products(products)
+        return super().to_representation(products)
+
+
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ['id', 'title', 'description', 'slug', 'price', 'inventory','price_with_tax', 'collection']
+        fields = ['id', 'title', 'description', 'slug', 'price', 'inventory','price_with_tax', 'collection', 'likes_count']
+        list_serializer_class = ProductListSerializer
 
     price_with_tax = serializers.SerializerMethodField('calculate_tax')
+    # annotated by ProductViewSet.get_queryset, see tags.counters.with_like_counts
+    likes_count = serializers.IntegerField(read_only=True)
 
     def calculate_tax(self, product: Product):
-        return product.price * Decimal(1.1)
+        prices = getattr(self, 'prices', None)
+        if prices is None or product.pk not in prices:
+            return pricer_from_context(self.context).price(product.price, product.collection_id).price_with_tax
+        return prices[product.pk].price_with_tax
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -47,7 +64,8 @@ class CartItemSerializer(serializers.ModelSerializer):
     total_price = serializers.SerializerMethodField('calculate_total_price')
 
     def calculate_total_price(self, cart_item: CartItem):
-        return cart_item.quantity * cart_item.product.price
+        price = cart_item.price if cart_item.price is not None else cart_item.product.price
+        return cart_item.quantity * price
 
     class Meta:
         model = CartItem
@@ -57,44 +75,73 @@ class CartItemSerializer(serializers.ModelSerializer):
 class CartSerializer(serializers.ModelSerializer):
     customer_id = serializers.UUIDField(read_only=True)
     items = CartItemSerializer(many=True, read_only=True)
-    total_price = serializers.SerializerMethodField('calculate_total_price')
+    items_count = serializers.IntegerField(read_only=True)
+    total_price = serializers.DecimalField(source='subtotal', max_digits=12, decimal_places=2, read_only=True)
 
-    def calculate_total_price(self, cart: Cart):
-        return sum([item.quantity * item.product.price for item in cart.items.all()])
     class Meta:  
         model= Cart
-        fields= ['customer_id', 'items','total_price']
+        fields= ['customer_id', 'items', 'items_count', 'total_price']
+
+
+class CartSummarySerializer(serializers.ModelSerializer):
+    total_price = serializers.DecimalField(source='subtotal', max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Cart
+        fields = ['customer_id', 'items_count', 'total_price']
+
+
+
 
 
+class AddCartItemListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        # one lookup for the whole payload instead of one per item
+        prices = dict(
+            Product.objects.filter(pk__in={item['product_id'] for item in attrs}).values_list('id', 'price')
+        )
+        errors = [
+            {} if item['product_id'] in prices else {'product_id': ['No product with the given ID was found.']}
+            for item in attrs
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        pricer = pricer_from_context(self.context)
+        for item in attrs:
+            item['price'] = pricer.unit_price(prices[item['product_id']])
+        return attrs
 
+    def save(self, **kwargs):
+        items = [(item['product_id'], item['quantity'], item['price']) for item in self.validated_data]
+        self.instance = add_cart_items(self.context['cart_pk'], items)
+        return self.instance
 
 
 class AddCartItemSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField()
 
-    def validate_product_id(self, value):
-        if not Product.objects.filter(pk=value).exists():
-            raise serializers.ValidationError('No product with the given ID was found.')
-        return value
+    def validate(self, attrs):
+        if isinstance(self.parent, serializers.ListSerializer):
+            return attrs
+        price = Product.objects.filter(pk=attrs['product_id']).values_list('price', flat=True).first()
+        if price is None:
+            raise serializers.ValidationError({'product_id': 'No product with the given ID was found.'})
+        attrs['price'] = pricer_from_context(self.context).unit_price(price)
+        return attrs
 
     def save(self, **kwargs):
-        cart_id = self.context['cart_pk']
-        product_id = self.validated_data['product_id']
-        quantity = self.validated_data['quantity']
-
-        try: 
-            cart_item= CartItem.objects.get(cart_id=cart_id, product_id=product_id)
-            cart_item.quantity += quantity
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            self.instance = CartItem.objects.create(cart_id=cart_id, **self.validated_data)
-
+        data = self.validated_data
+        [self.instance] = add_cart_items(
+            self.context['cart_pk'],
+            [(data['product_id'], data['quantity'], data['price'])],
+        )
         return self.instance
 
     class Meta:
         model = CartItem
         fields = ['id', 'product_id', 'quantity']
+        list_serializer_class = AddCartItemListSerializer
 
 
 class UpdateCartItemSerializer(serializers.ModelSerializer):
@@ -102,6 +149,17 @@ class UpdateCartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = ['quantity']
 
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            previous = instance.quantity
+            instance = super().update(instance, validated_data)
+            if instance.price is None:
+                refresh_cart_totals(Cart.objects.filter(pk=instance.cart_id))
+            else:
+                delta = instance.quantity - previous
+                adjust_cart_totals(instance.cart_id, delta, delta * instance.price)
+        return instance
+
 class DeleteCartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
@@ -131,6 +189,26 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['id', 'placed_at', 'customer','payment_status', 'order_items']
 
 
+class SimpleProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'title']
+
+
+class CustomerProductSummarySerializer(serializers.ModelSerializer):
+    product = SimpleProductSerializer()
+
+    class Meta:
+        model = CustomerProductSummary
+        fields = ['product', 'quantity', 'total_spent']
+
+
+class CustomerOrderSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomerOrderSummary
+        fields = ['customer_id', 'orders_count', 'total_spent', 'last_order_at']
+
+
 class UpdateOrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
@@ -149,25 +227,73 @@ class CreateOrderSerializer(serializers.Serializer):
     def save(self,**kwargs):
         with transaction.atomic():
             customer = Customer.objects.get(user_id=self.context['user_id'])
+            cart_items= CartItem.objects.select_related('product').filter(cart_id=self.validated_data['cart_id'])
+
+            # reserve stock before writing anything else so a sold-out
+            # item fails the checkout as early as possible
+            quantities = {}
+            for item in cart_items:
+                quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+            try:
+                reserve_inventory(quantities)
+            except InsufficientStock as error:
+                raise serializers.ValidationError({'items': [{
+                    'product_id': error.product_id,
+                    'quantity': error.quantity,
+                    'error': 'Not enough items in stock.',
+                }]})
+
             order=  Order.objects.create(
             customer = customer
             )
 
-            cart_items= CartItem.objects.select_related('product').filter(cart_id=self.validated_data['cart_id'])
+            # the cart's price snapshots follow whoever added the items; the
+            # order is priced again for the buyer, like a batch checkout
+            pricer = pricer_for_customer(customer, self.context.get('request'))
+            prices = pricer.price_products(item.product for item in cart_items)
             order_items = [
                 OrderItem(
                 order = order,
                 product = items.product,
                 quantity = items.quantity,
-                price = items.product.price
+                price = prices[items.product_id].unit_price
 
             ) for items in cart_items]
 
             OrderItem.objects.bulk_create(order_items)
             Cart.objects.filter(pk=self.validated_data['cart_id']).delete()
 
-            order_created.send_robust(sender=self.__class__, order=order)
+            # receivers run later in the process_outbox worker, outside
+            # this transaction and the request
+            enqueue('order_created', {'order_id': order.id})
             
             return order
 
 
+class BatchOrderItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class BatchOrderEntrySerializer(serializers.Serializer):
+    cart_id = serializers.UUIDField(required=False)
+    items = BatchOrderItemSerializer(many=True, required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if ('cart_id' in attrs) == ('items' in attrs):
+            raise serializers.ValidationError('Give either cart_id or items.')
+        return attrs
+
+
+class CreateOrdersSerializer(serializers.Serializer):
+    orders = BatchOrderEntrySerializer(many=True, allow_empty=False)
+
+    def validate_orders(self, orders):
+        limit = batch_order_settings()['MAX_ENTRIES']
+        if len(orders) > limit:
+            raise serializers.ValidationError(f'At most {limit} orders can be placed per request.')
+        return orders
+
+    def save(self, **kwargs):
+        customer = Customer.objects.get(user_id=self.context['user_id'])
+        return place_orders(customer, self.validated_data['orders'], pricer_for_customer(customer, self.context.get('request')))
@@ -1,10 +1,115 @@
-from store.models import Customer
+from store.models import Customer, MembershipDiscount, Order, Product, Collection, Review, TaxRule
+from store.cache import bump_catalog_version, bump_product_versions, bump_version, reviews_version_key
+from store.catalog import adjust_products_count
+from store.customers import invalidate_customer
+from store.history import rebuild_summaries, record_order_created, record_payment_status_change
+from store.pricing import bump_pricing_version
+from store.search import FIELD_WEIGHTS, index_product
+from tags.models import TaggedItem
+from tags.signals import like_counts_flushed
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer_for_new_user(sender, **kwargs):
     if kwargs['created']:
         Customer.objects.create(user=kwargs['instance'])
-    
\ No newline at end of file
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_cached_customer(sender, instance, **kwargs):
+    invalidate_customer(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Collection)
+@receiver([post_save, post_delete], sender=TaggedItem)
+def invalidate_catalog_cache(sender, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    # save(update_fields=['inventory']) and the like leave the terms as they are
+    if update_fields is not None and not update_fields & FIELD_WEIGHTS.keys():
+        return
+    index_product(instance)
+
+
+_UNKNOWN = object()
+
+
+@receiver(post_init, sender=Product)
+def remember_product_collection(sender, instance, **kwargs):
+    # read from __dict__ so deferred loads (.only()) don't trigger a query
+    instance._loaded_collection_id = instance.__dict__.get('collection_id', _UNKNOWN)
+
+
+@receiver(post_save, sender=Product)
+def update_collection_products_count(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_collection_id', _UNKNOWN)
+    if created:
+        adjust_products_count(instance.collection_id, 1)
+    elif previous is not _UNKNOWN and previous != instance.collection_id:
+        adjust_products_count(previous, -1)
+        adjust_products_count(instance.collection_id, 1)
+    instance._loaded_collection_id = instance.collection_id
+
+
+@receiver(post_delete, sender=Product)
+def decrement_collection_products_count(sender, instance, **kwargs):
+    adjust_products_count(instance.collection_id, -1)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_product_reviews(sender, instance, **kwargs):
+    key = reviews_version_key(instance.product_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+@receiver([post_save, post_delete], sender=TaxRule)
+@receiver([post_save, post_delete], sender=MembershipDiscount)
+def invalidate_pricing_rules(sender, **kwargs):
+    # cached product payloads embed prices, so they go with the rules
+    transaction.on_commit(bump_pricing_version)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_init, sender=Order)
+def remember_order_payment_status(sender, instance, **kwargs):
+    instance._loaded_payment_status = instance.__dict__.get('payment_status', _UNKNOWN)
+
+
+@receiver(post_save, sender=Order)
+def update_customer_order_summary(sender, instance, created, **kwargs):
+    # queryset.update() and bulk writes skip this; rebuild_order_summaries repairs them
+    previous = getattr(instance, '_loaded_payment_status', _UNKNOWN)
+    current = instance.payment_status
+    if created:
+        record_order_created(instance)
+        if current == Order.PAYMENT_STATUS_COMPLETE:
+            # the items are written after the order, count them once they exist
+            order_id, customer_id = instance.pk, instance.customer_id
+            transaction.on_commit(lambda: record_payment_status_change(order_id, customer_id, None, current))
+    elif previous is not _UNKNOWN and previous != current:
+        record_payment_status_change(instance.pk, instance.customer_id, previous, current)
+    instance._loaded_payment_status = current
+
+
+@receiver(post_delete, sender=Order)
+def rebuild_customer_summary_after_order_delete(sender, instance, **kwargs):
+    # the items (PROTECT) were deleted first, so recount the customer instead
+    # of subtracting the order
+    customer_id = instance.customer_id
+    transaction.on_commit(lambda: rebuild_summaries([customer_id]))
+
+
+@receiver(like_counts_flushed)
+def invalidate_products_after_like_flush(sender, object_ids, **kwargs):
+    # product payloads carry likes_count
+    product_ids = object_ids.get(ContentType.objects.get_for_model(Product).id)
+    if product_ids:
+        bump_product_versions(product_ids)
@@ -1,3 +1,1126 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin as django_admin
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed, ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import middleware as middleware_module
+from core.middleware import (
+    QueryBudgetExceeded, QueryBudgetMiddleware, RequestProfilingMiddleware, is_transaction_control, issue_profile_token,
+)
+from core.models import User
+from core.routers import ReplicaRouter, replica_reads
+from store import pricing, urls as store_urls
+from store.cache import CatalogCacheMixin, bump_catalog_version, get_catalog_cache, get_catalog_version, version_timeout
+from store.carts import adjust_cart_totals
+from store.catalog import CatalogRowError, parse_row
+from store.checks import check_catalog_cache_is_shared
+from store.exports import filter_orders
+from store.inventory import InsufficientStock, reserve_inventory
+from store.models import (
+    Cart, CartItem, Collection, Customer, CustomerOrderSummary, MembershipDiscount, Order, OrderItem, OutboxEvent,
+    Product, Review, TaxRule,
+)
+from store.outbox import claim_batch, dispatch, enqueue, record_results
+from store.pricing import Pricer
+from tags.counters import flush_like_deltas
+from tags.models import LikeCounter, LikeDelta, Tag, TagCounter, TaggedItem
+
+
+# URL kwarg -> attribute of the test case holding the object for that route.
+# Keys are route name prefixes ('<basename>-') matched longest first.
+DETAIL_OBJECTS = {
+    'products-': 'product',
+    'product-reviews-': 'review',
+    'collection-': 'collection',
+    'carts-': 'cart',
+    'cart-items-': 'cart_item',
+    'customers-': 'customer',
+    'orders-': 'order',
+}
+
+# extra query strings worth tracking on top of the bare routes
+ROUTE_VARIANTS = {
+    'products-list': ['', '?cursor=', '?search=product', '?ordering=-price', '?tag=1,2&tag_match=all',
+                      '?facets=collection,price,tag'],
+    'products-tag-facets': ['', '?search=product'],
+}
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # few distinct titles and prices, so most of the ordering keys tie
+        for index in range(25):
+            Product.objects.create(
+                title=f'Product {index % 4}', slug=f'product-{index}', price=Decimal(10 + index % 3), inventory=5,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url):
+        client, rows = APIClient(), []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            rows += response.data['results']
+            url = response.data['next']
+        self.assertEqual(len({row['id'] for row in rows}), 25)
+        return rows
+
+    def test_pages_cover_every_row_once_in_key_order(self):
+        rows = self.walk('/store/products/?cursor=&page_size=10')
+        keys = [(row['title'], row['id']) for row in rows]
+        self.assertEqual(keys, sorted(keys))
+
+        rows = self.walk('/store/products/?cursor=&page_size=10&ordering=-price')
+        keys = [(-row['price'], -row['id']) for row in rows]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_previous_link_returns_the_previous_page(self):
+        client = APIClient()
+        first = client.get('/store/products/?cursor=&page_size=10').data
+        second = client.get(first['next']).data
+        self.assertEqual(client.get(second['previous']).data['results'], first['results'])
+        self.assertEqual(client.get('/store/products/?cursor=garbage').status_code, 404)
+
+
+class CatalogVersionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_local_version_keys_expire(self):
+        first = get_catalog_version()
+        self.assertEqual(bump_catalog_version(), first + 1)
+        self.assertEqual(get_catalog_version(), first + 1)
+        # an expired key is reseeded from the clock, never reusing an old version
+        with override_settings(STORE_CATALOG_CACHE={'ALIAS': 'default', 'LOCAL_VERSION_TIMEOUT': 0}):
+            cache.clear()
+            get_catalog_version()
+        with mock.patch('store.cache.time.time', return_value=first / 1000 + 30):
+            self.assertEqual(get_catalog_version(), first + 30000)
+
+    def test_shared_cache_versions_do_not_expire(self):
+        self.assertIsNone(version_timeout(object()))
+        self.assertEqual(version_timeout(get_catalog_cache()), 30)
+
+    def test_process_local_cache_is_flagged_outside_debug(self):
+        with override_settings(DEBUG=False):
+            self.assertEqual([error.id for error in check_catalog_cache_is_shared(None)], ['store.W001'])
+        with override_settings(DEBUG=True):
+            self.assertEqual(check_catalog_cache_is_shared(None), [])
+
+
+class CatalogCacheStatsCommandTests(SimpleTestCase):
+    def test_refuses_to_report_a_process_local_cache(self):
+        with self.assertRaisesMessage(CommandError, 'local to each process'):
+            call_command('catalog_cache_stats', stdout=StringIO())
+
+    def test_reports_a_shared_cache(self):
+        stdout = StringIO()
+        with mock.patch('store.management.commands.catalog_cache_stats.is_shared_cache', return_value=True):
+            call_command('catalog_cache_stats', stdout=stdout)
+        self.assertIn('hit ratio', stdout.getvalue())
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.collection = Collection.objects.create(title='Lighting')
+        self.product = Product.objects.create(
+            title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5, collection=self.collection,
+        )
+        self.client = APIClient()
+
+    def test_pages_are_served_from_the_cache_until_a_write_commits(self):
+        self.client.get('/store/products/')
+        with self.assertNumQueries(0):
+            self.client.get('/store/products/')
+
+        self.product.title = 'Floor lamp'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.client.get('/store/products/').data[0]['title'], 'Floor lamp')
+
+    def test_collection_changes_invalidate_collection_pages(self):
+        self.client.get('/store/collections/')
+        self.collection.title = 'Lights'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.collection.save()
+        self.assertEqual(self.client.get('/store/collections/').data[0]['title'], 'Lights')
+
+
+class InventoryReservationTests(TestCase):
+    def setUp(self):
+        self.lamp = Product.objects.create(title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5)
+        self.desk = Product.objects.create(title='Desk', slug='desk', price=Decimal('90.00'), inventory=1)
+
+    def test_a_stale_read_cannot_oversell(self):
+        # both checkouts saw 5 in stock; the second one must not write 5 - 3 back
+        stale = Product.objects.get(pk=self.lamp.pk)
+        reserve_inventory({self.lamp.pk: 3})
+        with self.assertRaises(InsufficientStock):
+            reserve_inventory({stale.pk: stale.inventory - 2})
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.inventory, 2)
+
+    def test_failed_reservation_rolls_back_with_the_transaction(self):
+        with self.assertRaises(InsufficientStock) as raised, transaction.atomic():
+            reserve_inventory({self.lamp.pk: 2, self.desk.pk: 2})
+        self.assertEqual((raised.exception.product_id, raised.exception.quantity), (self.desk.pk, 2))
+        self.assertEqual(
+            dict(Product.objects.values_list('pk', 'inventory')), {self.lamp.pk: 5, self.desk.pk: 1},
+        )
+
+    def test_sold_out_checkout_keeps_the_cart(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='joe', email='joe@example.com'))
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=self.desk, quantity=2)
+        response = client.post('/store/orders/', {'cart_id': str(cart.pk)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['items'][0]['product_id'], str(self.desk.pk))
+        self.assertTrue(CartItem.objects.filter(cart=cart).exists())
+        self.assertFalse(Order.objects.exists())
+
+
+class CartItemUpsertTests(TestCase):
+    def setUp(self):
+        self.products = [
+            Product.objects.create(title=f'Product {index}', slug=f'product-{index}', price=Decimal('2.50'), inventory=5)
+            for index in range(3)
+        ]
+        self.client = APIClient()
+        self.cart_id = self.client.post('/store/carts/').data['customer_id']
+        self.url = f'/store/carts/{self.cart_id}/items/'
+
+    def items(self):
+        return {
+            item.product_id: (item.quantity, item.price)
+            for item in CartItem.objects.filter(cart_id=self.cart_id)
+        }
+
+    def test_adding_a_product_again_merges_and_keeps_the_price_snapshot(self):
+        first, second, third = self.products
+        self.client.post(self.url, {'product_id': first.id, 'quantity': 2}, format='json')
+        Product.objects.filter(pk=first.pk).update(price=Decimal('9.00'))
+        response = self.client.post(self.url, [
+            {'product_id': first.id, 'quantity': 1},
+            {'product_id': second.id, 'quantity': 1},
+            {'product_id': second.id, 'quantity': 2},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.items(), {first.id: (3, Decimal('2.50')), second.id: (3, Decimal('2.50'))})
+        summary = self.client.get(f'/store/carts/{self.cart_id}/summary/').data
+        self.assertEqual((summary['items_count'], summary['total_price']), (6, Decimal('15.00')))
+
+    def test_unknown_product_adds_nothing(self):
+        response = self.client.post(self.url, [
+            {'product_id': self.products[0].id, 'quantity': 1}, {'product_id': 0, 'quantity': 1},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.items(), {})
+
+
+class ProductConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5)
+        self.client = APIClient()
+
+    def test_invalid_pk_is_not_found(self):
+        self.assertEqual(self.client.get('/store/products/abc/').status_code, 404)
+        self.assertEqual(self.client.get('/store/products/0/').status_code, 404)
+
+    def test_clearing_inventory_in_admin_invalidates_etags(self):
+        url = f'/store/products/{self.product.pk}/'
+        etag = self.client.get(url)['ETag']
+        admin_user = User.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        self.client.force_login(admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:store_product_changelist'), {
+                'action': 'clear_inventory', '_selected_action': [self.product.pk],
+            })
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['inventory'], 0)
+
+    def test_list_revalidation_runs_no_queries(self):
+        etag = self.client.get('/store/products/?search=lamp')['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/store/products/?search=lamp', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0, [query['sql'] for query in queries])
+
+        self.product.title = 'Desk lamp'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.client.get('/store/products/?search=lamp', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_revalidation_is_decided_before_the_view_runs(self):
+        detail_url = f'/store/products/{self.product.pk}/'
+        detail_etag = self.client.get(detail_url)['ETag']
+        list_etag = self.client.get('/store/products/')['ETag']
+        self.assertNotIn('Last-Modified', self.client.get(detail_url))
+
+        with mock.patch.object(CatalogCacheMixin, '_cached_response') as handler:
+            self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code, 304)
+            self.assertEqual(self.client.get('/store/products/', HTTP_IF_NONE_MATCH=list_etag).status_code, 304)
+        handler.assert_not_called()
+
+    def test_reservation_invalidates_only_the_reserved_product(self):
+        other = Product.objects.create(title='Desk', slug='desk', price=Decimal('90.00'), inventory=5)
+        lamp_url, desk_url = f'/store/products/{self.product.pk}/', f'/store/products/{other.pk}/'
+        lamp_etag, desk_etag = self.client.get(lamp_url)['ETag'], self.client.get(desk_url)['ETag']
+        catalog_version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_inventory({self.product.pk: 2})
+
+        self.assertEqual(get_catalog_version(), catalog_version)
+        response = self.client.get(lamp_url, HTTP_IF_NONE_MATCH=lamp_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['inventory'], 3)
+        self.assertEqual(self.client.get(desk_url, HTTP_IF_NONE_MATCH=desk_etag).status_code, 304)
+
+
+class SearchIndexTests(TestCase):
+    def test_reindexes_only_when_indexed_fields_are_saved(self):
+        product = Product.objects.create(title='Desk lamp', slug='lamp', price=Decimal('30.00'), inventory=5)
+        self.assertEqual(set(product.search_terms.values_list('term', flat=True)), {'desk', 'lamp'})
+
+        product.inventory = 4
+        with self.assertNumQueries(1):
+            product.save(update_fields=['inventory'])
+
+        product.title = 'Floor lamp'
+        product.save(update_fields=['title', 'last_update'])
+        self.assertEqual(set(product.search_terms.values_list('term', flat=True)), {'floor', 'lamp'})
+
+
+class ProductTagFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lighting, cls.desks = Collection.objects.create(title='Lighting'), Collection.objects.create(title='Desks')
+        cls.red, cls.sale = Tag.objects.create(title='red'), Tag.objects.create(title='sale')
+        Tag.objects.create(title='oak')
+
+        def product(slug, price, collection, tags):
+            product = Product.objects.create(
+                title=slug.title(), slug=slug, price=Decimal(price), inventory=5, collection=collection,
+            )
+            for tag in tags:
+                TaggedItem.objects.create(tag=tag, content_type=ContentType.objects.get_for_model(Product), object_id=product.pk)
+            return product
+
+        cls.lamp = product('lamp', '30.00', cls.lighting, [cls.red, cls.sale])
+        cls.bulb = product('bulb', '3.00', cls.lighting, [cls.red])
+        cls.desk = product('desk', '120.00', cls.desks, [cls.sale])
+        cls.chair = product('chair', '60.00', None, [])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def slugs(self, query):
+        response = self.client.get(f'/store/products/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return {product['slug'] for product in response.data}
+
+    def facets(self, query=''):
+        return [(facet['title'], facet['count']) for facet in self.client.get(f'/store/products/tag-facets/?{query}').data]
+
+    def test_tag_filter_matches_any_or_all_tags(self):
+        tags = f'{self.red.pk},{self.sale.pk}'
+        self.assertEqual(self.slugs(f'tag={tags}'), {'lamp', 'bulb', 'desk'})
+        self.assertEqual(self.slugs(f'tag={tags}&tag_match=any'), {'lamp', 'bulb', 'desk'})
+        self.assertEqual(self.slugs(f'tag={tags}&tag_match=all'), {'lamp'})
+        self.assertEqual(self.slugs(f'tag={self.sale.pk}&collection_id={self.desks.pk}'), {'desk'})
+        self.assertEqual(self.slugs(f'tag={self.red.pk}&collection_id={self.desks.pk}'), set())
+
+    def test_tag_facets_count_the_filtered_products(self):
+        # unfiltered from TagCounter, unused tags left out
+        self.assertEqual(self.facets(), [('red', 2), ('sale', 2)])
+        self.assertEqual(self.facets(f'collection_id={self.lighting.pk}'), [('red', 2), ('sale', 1)])
+        self.assertEqual(self.facets(f'tag={self.sale.pk}'), [('sale', 2), ('red', 1)])
+        self.assertEqual(self.facets(f'tag={self.red.pk},{self.sale.pk}&tag_match=all'), [('red', 1), ('sale', 1)])
+        self.assertEqual(self.facets('price__gt=50'), [('sale', 1)])
+
+    def test_list_facets_describe_the_filtered_result_set(self):
+        response = self.client.get(f'/store/products/?tag={self.sale.pk}&facets=collection,price,tag')
+        self.assertEqual(response.status_code, 200)
+        facets = response.data['facets']
+        self.assertEqual(facets['collection'], [
+            {'id': self.desks.pk, 'title': 'Desks', 'count': 1},
+            {'id': self.lighting.pk, 'title': 'Lighting', 'count': 1},
+        ])
+        self.assertEqual([(bucket['min'], bucket['max'], bucket['count']) for bucket in facets['price']], [
+            (0, 10, 0), (10, 25, 0), (25, 50, 1), (50, 100, 0), (100, 250, 1), (250, None, 0),
+        ])
+        self.assertEqual(facets['tag'], [
+            {'id': self.sale.pk, 'title': 'sale', 'count': 2},
+            {'id': self.red.pk, 'title': 'red', 'count': 1},
+        ])
+
+        # the product without a collection is counted under a null one
+        facets = self.client.get('/store/products/?facets=collection').data['facets']
+        self.assertEqual(set(facets), {'collection'})
+        self.assertEqual(
+            [(facet['title'], facet['count']) for facet in facets['collection']],
+            [('Lighting', 2), (None, 1), ('Desks', 1)],
+        )
+
+
+class CollectionProductsCountTests(TestCase):
+    def test_count_follows_product_writes(self):
+        lighting, desks = Collection.objects.create(title='Lighting'), Collection.objects.create(title='Desks')
+        lamp = Product.objects.create(title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5, collection=lighting)
+        Product.objects.create(title='Bulb', slug='bulb', price=Decimal('3.00'), inventory=5, collection=lighting)
+
+        def counts():
+            return list(Collection.objects.order_by('pk').values_list('products_count', flat=True))
+
+        self.assertEqual(counts(), [2, 0])
+        lamp.collection = desks
+        lamp.save()
+        self.assertEqual(counts(), [1, 1])
+        renamed = Product.objects.only('id', 'title').get(pk=lamp.pk)
+        renamed.title = 'Desk lamp'
+        renamed.save()
+        self.assertEqual(counts(), [1, 1])
+        lamp.delete()
+        self.assertEqual(counts(), [1, 0])
+
+    def test_counters_that_drifted_below_their_rows_stop_at_zero(self):
+        lighting, desks = Collection.objects.create(title='Lighting'), Collection.objects.create(title='Desks')
+        lamp = Product.objects.create(title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5, collection=lighting)
+        # update() skips the signals, so desks still counts 0
+        Product.objects.filter(pk=lamp.pk).update(collection=desks)
+        Product.objects.get(pk=lamp.pk).delete()
+        self.assertEqual(Collection.objects.get(pk=desks.pk).products_count, 0)
+
+        tag = Tag.objects.create(title='sale')
+        item = TaggedItem.objects.create(tag=tag, content_type=ContentType.objects.get_for_model(Product), object_id=1)
+        TagCounter.objects.update(count=0)
+        item.delete()
+        self.assertEqual(TagCounter.objects.get().count, 0)
+
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=Product.objects.create(
+            title='Bulb', slug='bulb', price=Decimal('3.00'), inventory=5,
+        ), quantity=2, price=Decimal('3.00'))
+        Cart.objects.update(items_count=1, subtotal=Decimal('1.00'))
+        adjust_cart_totals(cart.pk, -2, Decimal('-6.00'))
+        cart.refresh_from_db()
+        self.assertEqual((cart.items_count, cart.subtotal), (0, Decimal('0.00')))
+
+    def test_collection_with_products_is_kept_when_the_count_lags(self):
+        collection = Collection.objects.create(title='Lighting')
+        Product.objects.create(title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5, collection=collection)
+        Collection.objects.filter(pk=collection.pk).update(products_count=0)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser(username='admin', email='admin@example.com', password='x'))
+
+        response = client.delete(f'/store/collections/{collection.pk}/')
+        self.assertEqual(response.status_code, 405)
+        self.assertTrue(Collection.objects.filter(pk=collection.pk).exists())
+
+
+class CatalogRowTests(SimpleTestCase):
+    def row(self, **values):
+        return {'slug': 'lamp', 'title': 'Lamp', 'price': '12.50', 'inventory': '3', **values}
+
+    def test_accepts_csv_and_ndjson_values(self):
+        self.assertEqual(parse_row(self.row())['price'], Decimal('12.50'))
+        self.assertEqual(parse_row(self.row(price=12.5, inventory=None))['inventory'], 0)
+
+    def test_rejects_prices_the_column_cannot_store(self):
+        for price in ['NaN', 'Infinity', '-Infinity', 'sNaN', float('nan'), '10000.00', '1.234', '0.50', '', None]:
+            with self.subTest(price=price), self.assertRaises(CatalogRowError):
+                parse_row(self.row(price=price))
+
+    def test_rejects_negative_inventory(self):
+        with self.assertRaises(CatalogRowError):
+            parse_row(self.row(inventory='-1'))
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.lighting = Collection.objects.create(title='Lighting')
+        self.old_lamp = Product.objects.create(
+            title='Old lamp', slug='old-lamp', price=Decimal('20.00'), inventory=1, collection=self.lighting,
+        )
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        return path
+
+    def import_catalog(self, path, chunk_size):
+        stdout = StringIO()
+        call_command('import_catalog', path, chunk_size=chunk_size, stdout=stdout, stderr=StringIO())
+        return stdout.getvalue()
+
+    def test_chunks_create_update_index_and_count(self):
+        lines = ['slug,title,description,price,inventory,collection']
+        lines += [f'lamp-{index},Brass lamp {index},warm light,{30 + index},{index},Lighting' for index in range(5)]
+        lines += [f'desk-{index},Oak desk {index},,{100 + index},2,Desks' for index in range(3)]
+        lines += ['old-lamp,Walnut desk,,95.00,4,Desks', 'broken,,,1.00,1,']
+        output = self.import_catalog(self.write('catalog.csv', lines), chunk_size=3)
+
+        self.assertEqual(output.count('rows imported'), 3)
+        self.assertIn('Imported catalog: 8 created, 1 updated, 1 skipped.', output)
+        self.assertEqual(Product.objects.count(), 9)
+        desks = Collection.objects.get(title='Desks')
+        self.assertEqual(
+            dict(Collection.objects.values_list('title', 'products_count')), {'Lighting': 5, 'Desks': 4},
+        )
+        moved = Product.objects.get(slug='old-lamp')
+        self.assertEqual((moved.title, moved.collection_id, moved.inventory), ('Walnut desk', desks.pk, 4))
+
+        # every chunk was indexed, and the updated product reindexed
+        self.assertEqual(
+            set(Product.objects.filter(search_terms__term='brass').values_list('slug', flat=True)),
+            {f'lamp-{index}' for index in range(5)},
+        )
+        self.assertEqual(dict(moved.search_terms.values_list('term', 'weight')), {'walnut': 3, 'desk': 3})
+        self.assertEqual(Product.objects.filter(search_terms__term='desk').count(), 4)
+
+        # a second import updates in place without duplicating rows or terms
+        path = self.write('update.ndjson', [
+            '{"slug": "lamp-0", "title": "Floor lamp", "price": 45, "inventory": 1, "collection": "Desks"}',
+            '{"slug": "lamp-9", "title": "Desk lamp", "price": "15.50", "inventory": 3}',
+        ])
+        self.assertIn('1 created, 1 updated, 0 skipped', self.import_catalog(path, chunk_size=1))
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(
+            dict(Collection.objects.values_list('title', 'products_count')), {'Lighting': 4, 'Desks': 5},
+        )
+        self.assertEqual(
+            set(Product.objects.get(slug='lamp-0').search_terms.values_list('term', flat=True)), {'floor', 'lamp'},
+        )
+        self.assertEqual(Product.objects.filter(search_terms__term='brass').count(), 4)
+
+
+class OutboxTests(TestCase):
+    def test_results_of_an_expired_claim_are_dropped(self):
+        event = enqueue('order_created', {'order_id': 0})
+        [stale] = claim_batch(10, lease_seconds=-1)
+        [fresh] = claim_batch(10, lease_seconds=60)
+        self.assertEqual((fresh.pk, fresh.attempts), (event.pk, 2))
+
+        self.assertEqual(record_results([(stale, None)], 5, 1, 60), (0, 0))
+        self.assertEqual(OutboxEvent.objects.get().status, OutboxEvent.STATUS_PROCESSING)
+
+        self.assertEqual(record_results([(fresh, 'boom')], 5, 1, 60), (0, 1))
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.last_error), (OutboxEvent.STATUS_PENDING, 'boom'))
+
+    def test_claims_are_disjoint_and_leased(self):
+        for order_id in range(3):
+            enqueue('order_created', {'order_id': order_id})
+        first = claim_batch(2, lease_seconds=60)
+        second = claim_batch(2, lease_seconds=60)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({event.pk for event in first} & {event.pk for event in second})
+        self.assertNotEqual(first[0].claim_token, second[0].claim_token)
+        # every event is leased, nothing is due until a lease expires
+        self.assertEqual(claim_batch(10, lease_seconds=60), [])
+
+    def test_failures_back_off_then_give_up(self):
+        event = enqueue('order_created', {'order_id': 0})
+        for attempt in range(1, 4):
+            OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+            [claimed] = claim_batch(1, lease_seconds=60)
+            self.assertEqual(claimed.attempts, attempt)
+            record_results([(claimed, dispatch(claimed))], 3, 10, 60)
+            event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.STATUS_FAILED)
+        self.assertIn('DoesNotExist', event.last_error)
+        self.assertEqual(claim_batch(1, lease_seconds=60), [])
+
+
+class QueryCountScalingTests(TestCase):
+    """
+    Request every GET route in store/urls.py against a small and a larger
+    data set and require the number of queries to stay the same: any route
+    whose query count grows with the number of rows has an N+1.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        cls.customer = Customer.objects.get(user=cls.user)
+        cls.collection = Collection.objects.create(title='Collection')
+        cls.cart = Cart.objects.create()
+        cls.product = cls.review = cls.cart_item = cls.order = None
+        cls.rows = 0
+
+    def seed(self, count):
+        for _ in range(count):
+            index = self.rows
+            self.rows += 1
+            product = Product.objects.create(
+                title=f'Product {index}', slug=f'product-{index}', description='product description',
+                price=Decimal('10.00') + index, inventory=100, collection=self.collection,
+            )
+            self.product = self.product or product
+            review = Review.objects.create(product=self.product, name=f'Reviewer {index}', description='ok')
+            self.review = self.review or review
+            cart_item = CartItem.objects.create(cart=self.cart, product=product, quantity=1, price=product.price)
+            self.cart_item = self.cart_item or cart_item
+            User.objects.create_user(username=f'user-{index}', email=f'user-{index}@example.com')
+            order = Order.objects.create(customer=self.customer)
+            self.order = self.order or order
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price),
+                OrderItem(order=order, product=self.product, quantity=2, price=self.product.price),
+            ])
+
+    def routes(self):
+        for pattern in store_urls.urlpatterns:
+            name = pattern.name
+            groups = pattern.pattern.regex.groupindex
+            if not name or name == 'api-root' or 'format' in groups:
+                continue
+            kwargs = {}
+            for group in groups:
+                if group == 'product_pk':
+                    kwargs[group] = self.product.pk
+                elif group == 'cart_pk':
+                    kwargs[group] = self.cart.pk
+                elif group == 'pk':
+                    prefix = max((prefix for prefix in DETAIL_OBJECTS if name.startswith(prefix)), key=len)
+                    kwargs[group] = getattr(self, DETAIL_OBJECTS[prefix]).pk
+            path = reverse(name, kwargs=kwargs)
+            for query in ROUTE_VARIANTS.get(name, ['']):
+                yield f'{name}{query}', path + query
+
+    def measure(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        counts = {}
+        for label, url in self.routes():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 500, f'{label} failed with {response.status_code}')
+            counts[label] = len(queries)
+        return counts
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.seed(2)
+        small = self.measure()
+        self.seed(8)
+        large = self.measure()
+
+        self.assertTrue(small)
+        grown = {label: (small[label], large[label]) for label in small if small[label] != large[label]}
+        self.assertEqual(grown, {}, 'query count grows with the number of rows (small, large)')
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    def setUp(self):
+        Product.objects.create(title='Product', slug='product', price=Decimal('10.00'), inventory=1)
+        cache.clear()
+
+    def get(self, url):
+        # the client builds its handler, and so the middleware, on first use
+        return APIClient().get(url)
+
+    @override_settings(QUERY_BUDGET={'ENABLED': True, 'HEADERS': True})
+    def test_reports_query_count_and_time(self):
+        response = self.get('/store/products/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-DB-Queries']), 0)
+        self.assertIn('X-DB-Time-Ms', response)
+
+    @override_settings(QUERY_BUDGET={'ENABLED': True, 'ENFORCE': True, 'BUDGETS': {'ProductViewSet.list': 0}})
+    def test_enforced_budget_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.get('/store/products/')
+
+    @override_settings(QUERY_BUDGET={**settings.QUERY_BUDGET, 'ENABLED': True, 'ENFORCE': True})
+    def test_customer_routes_stay_within_budget_on_cold_caches(self):
+        # a non-staff customer: the staff paths skip the customer lookup
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='x')
+        user.user_permissions.add(Permission.objects.get(codename='view_history'))
+        customer = Customer.objects.get(user=user)
+        product = Product.objects.get()
+        product.collection = Collection.objects.create(title='Lighting')
+        product.save()
+        Review.objects.create(product=product, name='Joe', description='ok')
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=product, quantity=1, price=product.price)
+        order = Order.objects.create(customer=customer)
+        OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+
+        requests = {
+            'ProductViewSet.list': ('get', f'/store/products/?collection_id={product.collection_id}', None),
+            'ProductViewSet.retrieve': ('get', f'/store/products/{product.pk}/', None),
+            'CollectionViewSet.list': ('get', '/store/collections/', None),
+            'CollectionViewSet.retrieve': ('get', f'/store/collections/{product.collection_id}/', None),
+            'ReviewViewSet.list': ('get', f'/store/products/{product.pk}/reviews/', None),
+            'CartViewSet.retrieve': ('get', f'/store/carts/{cart.pk}/', None),
+            'CartViewSet.summary': ('get', f'/store/carts/{cart.pk}/summary/', None),
+            'CartItemViewSet.list': ('get', f'/store/carts/{cart.pk}/items/', None),
+            'CartItemViewSet.create': ('post', f'/store/carts/{cart.pk}/items/', {'product_id': product.pk, 'quantity': 1}),
+            'CustomerViewSet.me': ('get', '/store/customers/me/', None),
+            'CustomerViewSet.history': ('get', f'/store/customers/{customer.pk}/history/', None),
+            'OrderViewSet.list': ('get', '/store/orders/', None),
+            'OrderViewSet.retrieve': ('get', f'/store/orders/{order.pk}/', None),
+            'OrderViewSet.batch': ('post', '/store/orders/batch/', {'orders': [{'items': [{'product_id': product.pk, 'quantity': 1}]}]}),
+        }
+        self.assertEqual(set(requests), set(settings.QUERY_BUDGET['BUDGETS']))
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(user)}')
+        for label, (method, url, data) in requests.items():
+            with self.subTest(label):
+                cache.clear()
+                ContentType.objects.clear_cache()
+                response = getattr(client, method)(url, data, format='json')
+                self.assertLess(response.status_code, 300, response.data)
+
+    @override_settings(QUERY_BUDGET={'ENABLED': False})
+    def test_disabled_middleware_is_not_installed(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryBudgetMiddleware(lambda request: None)
+
+
+class RequestProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        Product.objects.create(title='Product', slug='product', price=Decimal('10.00'), inventory=1)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def profile(self, sample_rate=0.0, **headers):
+        config = {'ENABLED': True, 'SAMPLE_RATE': sample_rate, 'DIRECTORY': self.directory}
+        with self.settings(REQUEST_PROFILING=config):
+            response = APIClient().get('/store/products/', **headers)
+        self.assertEqual(response.status_code, 200)
+        return sorted(os.listdir(self.directory))
+
+    def test_unsampled_request_is_not_profiled(self):
+        self.assertEqual(self.profile(), [])
+
+    def test_signed_token_profiles_request(self):
+        files = self.profile(HTTP_X_PROFILE_TOKEN=issue_profile_token())
+
+        self.assertEqual([name.rsplit('.', 1)[1] for name in files], ['json', 'prof'])
+        with open(os.path.join(self.directory, files[0])) as stream:
+            meta = json.load(stream)
+        self.assertEqual(meta['view'], 'ProductViewSet.list')
+        self.assertEqual(meta['sql_count'], len(meta['sql']))
+
+        output = StringIO()
+        call_command('profile_report', directory=self.directory, stdout=output)
+        self.assertIn('ProductViewSet.list  (1 requests)', output.getvalue())
+
+    def test_forged_token_is_ignored(self):
+        self.assertEqual(self.profile(HTTP_X_PROFILE_TOKEN='forged:token'), [])
+
+    def test_sample_rate(self):
+        self.assertEqual(len(self.profile(sample_rate=1.0)), 2)
+
+    def test_request_runs_unprofiled_while_another_profiler_is_active(self):
+        # Python 3.12+ raises ValueError from enable() in that case
+        with mock.patch.object(middleware_module.cProfile, 'Profile') as profile:
+            profile.return_value.enable.side_effect = ValueError('Another profiling tool is already active')
+            self.assertEqual(self.profile(sample_rate=1.0), [])
+
+    def test_concurrent_picked_request_runs_unprofiled(self):
+        with middleware_module._profiling_lock:
+            self.assertEqual(self.profile(sample_rate=1.0), [])
+        self.assertEqual(len(self.profile(sample_rate=1.0)), 2)
+
+    @override_settings(REQUEST_PROFILING={'ENABLED': False})
+    def test_disabled_middleware_is_not_installed(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestProfilingMiddleware(lambda request: None)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    def test_reads_go_to_replica_only_when_allowed(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Product), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Product), 'replica')
+
+    def test_write_pins_rest_of_request_to_primary(self):
+        router = ReplicaRouter()
+        with replica_reads():
+            self.assertEqual(router.db_for_write(Product), 'default')
+            self.assertEqual(router.db_for_read(Product), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        router = ReplicaRouter()
+        self.assertFalse(router.allow_migrate('replica', 'store'))
+        self.assertTrue(router.allow_migrate('default', 'store'))
+
+
+class TaxRuleTests(TestCase):
+    def test_one_rule_per_region_for_any_collection(self):
+        TaxRule.objects.create(region='NP', rate=Decimal('0.13'))
+        duplicate = TaxRule(region='NP', rate=Decimal('0.05'))
+        with self.assertRaises(ValidationError):
+            duplicate.validate_constraints()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            duplicate.save()
+        TaxRule.objects.create(region='NP', collection=Collection.objects.create(title='Books'), rate=Decimal('0.05'))
+
+
+class PricerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(pricing, '_compiled', (None, None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.books, self.music = Collection.objects.create(title='Books'), Collection.objects.create(title='Music')
+
+    def test_most_specific_tax_rule_wins(self):
+        TaxRule.objects.create(region='', rate=Decimal('0.05'))
+        TaxRule.objects.create(region='', collection=self.books, rate=Decimal('0.07'))
+        TaxRule.objects.create(region='NP', rate=Decimal('0.13'))
+        TaxRule.objects.create(region='NP', collection=self.books, rate=Decimal('0.01'))
+
+        nepal, india = Pricer(region='np'), Pricer(region='IN')
+        self.assertEqual(nepal.tax_rate(self.books.pk), Decimal('0.01'))
+        self.assertEqual(nepal.tax_rate(self.music.pk), Decimal('0.13'))
+        self.assertEqual(nepal.tax_rate(None), Decimal('0.13'))
+        self.assertEqual(india.tax_rate(self.books.pk), Decimal('0.07'))
+        self.assertEqual(india.tax_rate(self.music.pk), Decimal('0.05'))
+
+        TaxRule.objects.filter(collection__isnull=True).delete()
+        rules = pricing.compile_rules()
+        self.assertEqual(Pricer(region='IN', rules=rules).tax_rate(self.music.pk), Decimal('0.10'))
+
+    def test_prices_round_half_up_to_cents(self):
+        MembershipDiscount.objects.create(membership=Customer.MEMBERSHIP_GOLD, percent=Decimal('50'))
+        # half-even rounding would give 1.26 and 5.02
+        self.assertEqual(Pricer().price(Decimal('1.15'), None), (Decimal('1.15'), Decimal('1.27')))
+        gold = Pricer(membership=Customer.MEMBERSHIP_GOLD)
+        self.assertEqual(gold.price(Decimal('10.05'), None), (Decimal('5.03'), Decimal('5.53')))
+
+    def test_saving_or_deleting_a_rule_recompiles_the_cached_rules(self):
+        self.assertEqual(pricing.get_rules()['taxes'], {})
+        with self.assertNumQueries(0):
+            pricing.get_rules()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rule = TaxRule.objects.create(region='np', rate=Decimal('0.13'))
+        self.assertEqual(Pricer(region='NP').tax_rate(None), Decimal('0.13'))
+
+        rule.rate = Decimal('0.15')
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.assertEqual(Pricer(region='NP').tax_rate(None), Decimal('0.15'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            discount = MembershipDiscount.objects.create(membership=Customer.MEMBERSHIP_GOLD, percent=Decimal('10'))
+        self.assertEqual(Pricer(membership=Customer.MEMBERSHIP_GOLD).unit_price(Decimal('20.00')), Decimal('18.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.delete()
+            discount.delete()
+        self.assertEqual(pricing.get_rules(), {'taxes': {}, 'discounts': {}})
+
+
+class ProductLikeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.lamp = Product.objects.create(title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5)
+        self.desk = Product.objects.create(title='Desk', slug='desk', price=Decimal('90.00'), inventory=5)
+
+    def client_for(self, username):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username=username, email=f'{username}@example.com'))
+        return client
+
+    def test_likes_are_counted_once_per_user_after_a_flush(self):
+        url = f'/store/products/{self.lamp.pk}/like/'
+        joe, ann = self.client_for('joe'), self.client_for('ann')
+        self.assertEqual(joe.post(url).status_code, 201)
+        self.assertEqual(joe.post(url).status_code, 200)
+        self.assertEqual(ann.post(url).status_code, 201)
+        self.assertEqual(ann.delete(url).status_code, 204)
+        self.assertEqual(LikeDelta.objects.count(), 3)
+
+        client = APIClient()
+        lamp_url, desk_url = f'/store/products/{self.lamp.pk}/', f'/store/products/{self.desk.pk}/'
+        self.assertEqual(client.get(lamp_url).data['likes_count'], 0)
+        desk_etag = client.get(desk_url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(flush_like_deltas(), 3)
+        self.assertFalse(LikeDelta.objects.exists())
+        self.assertEqual(LikeCounter.objects.get(object_id=self.lamp.pk).count, 1)
+        # the cached lamp detail is refreshed, the desk is still current
+        self.assertEqual(client.get(lamp_url).data['likes_count'], 1)
+        self.assertEqual(client.get(desk_url, HTTP_IF_NONE_MATCH=desk_etag).status_code, 304)
+        self.assertEqual(client.get('/store/products/?search=lamp').data[0]['likes_count'], 1)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='secret')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(self.user)}')
+
+    def test_repeated_requests_skip_user_and_customer_queries(self):
+        self.assertEqual(self.client.get('/store/customers/me/').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/store/customers/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 0, [query['sql'] for query in queries])
+
+    def test_changes_invalidate_cached_user_and_customer(self):
+        self.client.get('/store/customers/me/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/store/customers/me/').status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        customer = Customer.objects.get(user=self.user)
+        customer.membership = Customer.MEMBERSHIP_GOLD
+        customer.save()
+        self.assertEqual(self.client.get('/store/customers/me/').data['membership'], Customer.MEMBERSHIP_GOLD)
+
+    def test_orders_are_priced_with_the_current_membership(self):
+        MembershipDiscount.objects.create(membership=Customer.MEMBERSHIP_GOLD, percent=Decimal('10'))
+        product = Product.objects.create(title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5)
+        self.client.get('/store/customers/me/')
+        # update() skips the signals, as a change made by another process would
+        Customer.objects.filter(user=self.user).update(membership=Customer.MEMBERSHIP_GOLD)
+
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+        response = self.client.post('/store/orders/', {'cart_id': str(cart.pk)}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(OrderItem.objects.get(order_id=response.data['id']).price, Decimal('27.00'))
+
+    def test_orders_are_scoped_to_the_customer(self):
+        other = User.objects.create_user(username='joe', email='joe@example.com', password='secret')
+        Order.objects.create(customer=Customer.objects.get(user=other))
+        mine = Order.objects.create(customer=Customer.objects.get(user=self.user))
+        response = self.client.get('/store/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order['id'] for order in response.data], [mine.id])
+
+
+class BatchOrderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='partner', email='partner@example.com', password='secret')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(self.user)}')
+        self.products = [
+            Product.objects.create(title=f'Product {index}', slug=f'product-{index}', price=Decimal('10.00'), inventory=100)
+            for index in range(5)
+        ]
+
+    def place(self, entries):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/store/orders/batch/', {'orders': entries}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data, len([query for query in queries if not is_transaction_control(query['sql'])])
+
+    def entries(self, count):
+        entries = []
+        for index in range(count):
+            cart = Cart.objects.create()
+            CartItem.objects.create(cart=cart, product=self.products[index % 5], quantity=1)
+            entries.append({'cart_id': str(cart.pk)})
+            entries.append({'items': [{'product_id': self.products[(index + 1) % 5].id, 'quantity': 1}]})
+        return entries
+
+    def test_query_count_does_not_grow_with_entries(self):
+        # the first batch also loads the user, the customer and the pricing rules
+        _, first_queries = self.place(self.entries(1))
+        small, small_queries = self.place(self.entries(2))
+        large, large_queries = self.place(self.entries(10))
+        self.assertEqual((small['created'], large['created']), (4, 20))
+        self.assertEqual(small_queries, large_queries)
+        self.assertLessEqual(first_queries, settings.QUERY_BUDGET['BUDGETS']['OrderViewSet.batch'])
+        self.assertEqual(Order.objects.count(), 26)
+        self.assertEqual(OrderItem.objects.count(), 26)
+        self.assertEqual(Cart.objects.count(), 0)
+        self.assertEqual(sum(Product.objects.values_list('inventory', flat=True)), 500 - 26)
+
+    def test_entries_fail_independently(self):
+        product = self.products[0]
+        data, _ = self.place([
+            {'items': [{'product_id': product.id, 'quantity': 60}]},
+            {'items': [{'product_id': product.id, 'quantity': 60}]},
+            {'items': [{'product_id': 0, 'quantity': 1}]},
+            {'cart_id': str(Cart.objects.create().pk)},
+        ])
+        self.assertEqual((data['created'], data['failed']), (1, 3))
+        self.assertIn('order_id', data['results'][0])
+        self.assertEqual(data['results'][1]['errors']['items'][0]['error'], 'Not enough items in stock.')
+        self.assertEqual(data['results'][2]['errors']['items'][0]['product_id'], 0)
+        self.assertEqual(data['results'][3]['errors'], {'cart_id': ['The cart is empty.']})
+        product.refresh_from_db()
+        self.assertEqual(product.inventory, 40)
+        self.assertEqual(Customer.objects.get(user=self.user).order_summary.orders_count, 1)
+
+
+class OrderExportFilterTests(TestCase):
+    def test_date_range_matches_orders_placed_out_of_id_order(self):
+        customer = Customer.objects.get(user=User.objects.create_user(username='joe', email='joe@example.com'))
+        now = timezone.now()
+        orders = [Order.objects.create(customer=customer) for _ in range(4)]
+        for order, days in zip(orders, [3, 1, 5, 2]):
+            Order.objects.filter(pk=order.pk).update(placed_at=now - timedelta(days=days))
+
+        matched = filter_orders(Order.objects.all(), now - timedelta(days=3, hours=1), now - timedelta(hours=36))
+        self.assertEqual(sorted(matched.values_list('pk', flat=True)), [orders[0].pk, orders[3].pk])
+        self.assertFalse(filter_orders(Order.objects.all(), placed_after=now).exists())
+
+
+class OrderSummaryTests(TestCase):
+    def test_deleting_an_order_updates_the_summary(self):
+        customer = Customer.objects.get(user=User.objects.create_user(username='joe', email='joe@example.com'))
+        product = Product.objects.create(title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = Order.objects.create(customer=customer, payment_status=Order.PAYMENT_STATUS_COMPLETE)
+            OrderItem.objects.create(order=kept, product=product, quantity=1, price=Decimal('30.00'))
+            deleted = Order.objects.create(customer=customer, payment_status=Order.PAYMENT_STATUS_COMPLETE)
+            OrderItem.objects.create(order=deleted, product=product, quantity=2, price=Decimal('30.00'))
+        self.assertEqual(customer.order_summary.total_spent, Decimal('90.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted.order_items.all().delete()
+            deleted.delete()
+        summary = CustomerOrderSummary.objects.get(customer=customer)
+        self.assertEqual((summary.orders_count, summary.last_order_at), (1, kept.placed_at))
+        self.assertEqual(summary.total_spent, Decimal('30.00'))
+        self.assertEqual(customer.product_summaries.get().quantity, 1)
+
+
+class SweepCartsTests(TestCase):
+    def test_deletes_only_old_carts_in_batches(self):
+        product = Product.objects.create(title='Product', slug='product', price=Decimal('10.00'), inventory=10)
+        old = [Cart.objects.create() for _ in range(5)]
+        for cart in old:
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+        Cart.objects.filter(pk__in=[cart.pk for cart in old]).update(created_at=timezone.now() - timedelta(days=40))
+        fresh = Cart.objects.create()
+
+        out = StringIO()
+        call_command('sweep_carts', '--days=30', '--batch-size=2', '--sleep=0', stdout=out)
+        self.assertIn('Deleted 5 carts and 5 items', out.getvalue())
+        self.assertIn('Batch 3:', out.getvalue())
+        self.assertEqual(list(Cart.objects.values_list('pk', flat=True)), [fresh.pk])
+        self.assertFalse(CartItem.objects.exists())
+
+
+class LargeTableAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        product = Product.objects.create(title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5)
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+        Order.objects.create(customer=Customer.objects.get(user=cls.user))
+
+    def test_changelists_avoid_distinct_and_unbounded_counts(self):
+        self.client.force_login(self.user)
+        urls = [
+            reverse('admin:store_product_changelist') + '?price_range=25-50&title_range=KP',
+            reverse('admin:store_product_changelist') + '?title_range=other',
+            reverse('admin:store_order_changelist') + '?q=adm',
+            reverse('admin:store_cart_changelist'),
+            reverse('admin:store_cartitem_changelist'),
+        ]
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            sql = [query['sql'] for query in queries]
+            self.assertFalse([query for query in sql if 'DISTINCT' in query], url)
+            counts = [query for query in sql if 'COUNT(' in query]
+            self.assertTrue(counts and all('LIMIT' in query for query in counts), (url, counts))
+        self.assertContains(self.client.get(urls[0]), '1 result')
+
+
+class CSVExportAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x', first_name='Ada', last_name='Admin',
+        )
+        customer = Customer.objects.get(user=cls.user)
+        cls.product = Product.objects.create(title='Lamp', slug='lamp', price=Decimal('30.00'), inventory=5)
+        Product.objects.create(title='Mug', slug='mug', price=Decimal('5.00'), inventory=5)
+        for _ in range(3):
+            order = Order.objects.create(customer=customer)
+            OrderItem.objects.create(order=order, product=cls.product, quantity=2, price=Decimal('30.00'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_export_view_streams_filtered_rows_in_chunks(self):
+        admin = django_admin.site._registry[Order]
+        with mock.patch.object(admin, 'csv_export_chunk_size', 2), CaptureQueriesContext(connection) as queries:
+            lines = self.export(reverse('admin:store_order_export') + '?payment_status__exact=P')
+        self.assertEqual(lines[0], 'id,placed_at,customer_id,customer_email,payment_status,items,total')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].endswith(',admin@example.com,P,2,60.00'))
+        # two chunks, each an order query plus one item prefetch
+        self.assertEqual(len([query for query in queries if 'store_orderitem' in query['sql']]), 2)
+
+    def test_columns_can_be_picked(self):
+        lines = self.export(reverse('admin:store_product_export') + '?columns=title,collection&price_range=25-50')
+        self.assertEqual(lines, ['title,collection', 'Lamp,'])
+        response = self.client.get(reverse('admin:store_product_export') + '?columns=bogus')
+        self.assertEqual(response.status_code, 400)
+
+    def test_formulas_are_escaped(self):
+        Product.objects.filter(pk=self.product.pk).update(title='=HYPERLINK("http://example.com")')
+        lines = self.export(reverse('admin:store_product_export') + '?columns=title,price&price_range=25-50')
+        self.assertEqual(lines[1], '"\'=HYPERLINK(""http://example.com"")",30.00')
+
+    def test_action_exports_selected_customers(self):
+        customer = Customer.objects.get(user=self.user)
+        response = self.client.post(reverse('admin:store_customer_changelist'), {
+            'action': 'export_csv', '_selected_action': [customer.pk],
+        })
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,first_name,last_name,email,phone,birth_date,membership,orders_count,total_spent')
+        self.assertTrue(lines[1].startswith(f'{customer.pk},Ada,Admin,admin@example.com,'))
+        self.assertTrue(lines[1].endswith(',3,0.00'))
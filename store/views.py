@@ -2,11 +2,23 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.mixins import  CreateModelMixin,DestroyModelMixin, UpdateModelMixin, RetrieveModelMixin
+from store.cache import CatalogCacheMixin, payload_product_ids
+from store.carts import adjust_cart_totals, refresh_cart_totals
+from store.conditional import CatalogVersionConditionalMixin, ProductConditionalMixin, ReviewConditionalMixin
+from store.customers import get_customer
+from store.exports import filter_orders, iter_orders, order_export_lines, parse_boundary
+from store.facets import FacetedListMixin, is_filtered, tag_facets
 from store.filters import ProductFilter
-from store.models import Cart, Product, Collection, Review, CartItem,Customer, Order
+from store.pagination import KeysetPagination, OrderHistoryPagination
+from store.pricing import pricer_for_request
+from store.search import ProductSearchFilter
+from store.models import Cart, Product, Collection, Review, CartItem,Customer, CustomerOrderSummary, CustomerProductSummary, Order
 from store.permission import FullDjangoModelPermissions, IsAdminOrReadOnly, ViewCustomerHistoryPermission
-from store.serializers import CartSerializer, ProductSerializer, CustomerSerializer, CollectionSerializer, ReviewSerializer, CartItemSerializer,AddCartItemSerializer,UpdateCartItemSerializer, DeleteCartItemSerializer, OrderSerializer,CreateOrderSerializer, UpdateOrderSerializer
-from django.db.models import Count
+from store.serializers import CartSerializer, CartSummarySerializer, ProductSerializer, CustomerSerializer, CustomerOrderSummarySerializer, CustomerProductSummarySerializer, CollectionSerializer, ReviewSerializer, CartItemSerializer,AddCartItemSerializer,UpdateCartItemSerializer, DeleteCartItemSerializer, OrderSerializer,CreateOrderSerializer, CreateOrdersSerializer, UpdateOrderSerializer
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import ProtectedError
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from django_filters.rest_framework import DjangoFilterBackend
@@ -14,33 +26,93 @@ from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, DjangoModelPermissions
+from tags.counters import with_like_counts
+from tags.models import LikedItem
 
 
-class CollectionViewSet(ModelViewSet):
-     queryset = Collection.objects.annotate(products_count=Count('products')).all()
+class CollectionViewSet(CatalogVersionConditionalMixin, CatalogCacheMixin, ModelViewSet):
+     queryset = Collection.objects.all()
      serializer_class = CollectionSerializer
      filter_backends = [DjangoFilterBackend, SearchFilter]
      permission_classes = [IsAdminOrReadOnly]
      def destroy(self, request, *args, **kwargs):
-         collection = get_object_or_404(Collection.objects.annotate(products_count=Count('products')), pk=kwargs['pk'])
-         if collection.products.count()>0:
-                return Response({'error': 'Collection cannot be deleted because it includes one or more products.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
-         collection.delete()
-         return super().destroy(request, *args, **kwargs)
+         collection = get_object_or_404(Collection, pk=kwargs['pk'])
+         error = Response({'error': 'Collection cannot be deleted because it includes one or more products.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+         if collection.products_count>0:
+                return error
+         # products_count can lag behind (bulk writes), Product.collection is PROTECT
+         try:
+                collection.delete()
+         except ProtectedError:
+                return error
+         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 
 
 
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(ProductConditionalMixin, CatalogCacheMixin, FacetedListMixin, ModelViewSet):
      queryset = Product.objects.all()
      serializer_class = ProductSerializer
-     filter_backends = [DjangoFilterBackend, SearchFilter]
+     filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
      filterset_class = ProductFilter
      search_fields = ['title', 'description']
-     ordering_fields = ['price', 'last_update']
+     ordering_fields = ['title', 'price', 'last_update']
      pagination_class = PageNumberPagination
+     cursor_pagination_class = KeysetPagination
      permission_classes = [IsAdminOrReadOnly]
+     catalog_cache_actions = ('list', 'retrieve', 'tag_facets')
+
+     @property
+     def paginator(self):
+          # Passing ?cursor= (empty for the first page) switches the list to
+          # keyset pagination: no COUNT(*) and no OFFSET scans on deep pages.
+          if not hasattr(self, '_paginator'):
+               if self.cursor_pagination_class.cursor_query_param in self.request.query_params:
+                    self._paginator = self.cursor_pagination_class()
+               else:
+                    return super().paginator
+          return self._paginator
+
+     def get_cache_variant(self):
+          # price_with_tax depends on the region and the customer's tier
+          return pricer_for_request(self.request).key
+
+     def get_cached_product_ids(self, data):
+          # inventory and likes_count are invalidated per product
+          if self.action in ('list', 'retrieve'):
+               return payload_product_ids(data)
+          return []
+
+     def get_queryset(self):
+          queryset = super().get_queryset()
+          if self.action in ('list', 'retrieve'):
+               queryset = with_like_counts(queryset)
+          return queryset
+
+     @action(detail=True, methods=['POST', 'DELETE'], permission_classes=[IsAuthenticated])
+     def like(self, request, pk):
+          # counts are staged and folded in later by flush_like_counters
+          product = get_object_or_404(Product.objects.only('id'), pk=pk)
+          content_type = ContentType.objects.get_for_model(Product)
+          if request.method == 'DELETE':
+               LikedItem.objects.filter(user=request.user, content_type=content_type, object_id=product.id).delete()
+               return Response(status=status.HTTP_204_NO_CONTENT)
+          try:
+               with transaction.atomic():
+                    LikedItem.objects.create(user=request.user, content_type=content_type, object_id=product.id)
+          except IntegrityError:
+               return Response({'liked': True}, status=status.HTTP_200_OK)
+          return Response({'liked': True}, status=status.HTTP_201_CREATED)
+
+     @action(detail=False, methods=['GET'], url_path='tag-facets')
+     def tag_facets(self, request):
+          return self._cached_response(self._tag_facets, request)
+
+     def _tag_facets(self, request):
+          queryset = self.filter_queryset(self.get_queryset())
+          return Response(tag_facets(queryset, filtered=is_filtered(request, self)))
+
      def destroy(self, request, pk):
           product = get_object_or_404(Product,pk = pk)
           if product.orderitem_set.count()>0:
@@ -51,7 +123,7 @@ class ProductViewSet(ModelViewSet):
 
 
         
-class ReviewViewSet(ModelViewSet):
+class ReviewViewSet(ReviewConditionalMixin, ModelViewSet):
     serializer_class = ReviewSerializer
 
     def get_queryset(self):
@@ -68,6 +140,12 @@ class CartViewSet(CreateModelMixin,RetrieveModelMixin, DestroyModelMixin,Generic
      queryset = Cart.objects.prefetch_related('items__product').all()
      serializer_class = CartSerializer
 
+     @action(detail=True, methods=['GET'])
+     def summary(self, request, pk):
+          # badge reads come straight from the maintained totals: one row, no joins
+          cart = get_object_or_404(Cart.objects.only('customer_id', 'items_count', 'subtotal'), pk=pk)
+          return Response(CartSummarySerializer(cart).data)
+
 
 class CartItemViewSet(ModelViewSet):
      # serializer_class = CartItemSerializer
@@ -83,13 +161,28 @@ class CartItemViewSet(ModelViewSet):
           
           return CartItemSerializer
      
+     def get_serializer(self, *args, **kwargs):
+          # a list payload adds several products in one request
+          if isinstance(kwargs.get('data'), list):
+               kwargs['many'] = True
+          return super().get_serializer(*args, **kwargs)
+
      def get_serializer_context(self):
           return {
-               'cart_pk': self.kwargs['cart_pk']
+               'cart_pk': self.kwargs['cart_pk'],
+               'request': self.request,
           }
 
      def get_queryset(self):
           return CartItem.objects.select_related('product').filter(cart_id=self.kwargs['cart_pk'])
+
+     def perform_destroy(self, instance):
+          with transaction.atomic():
+               instance.delete()
+               if instance.price is None:
+                    refresh_cart_totals(Cart.objects.filter(pk=instance.cart_id))
+               else:
+                    adjust_cart_totals(instance.cart_id, -instance.quantity, -instance.quantity * instance.price)
       
 
 class CustomerViewSet(ModelViewSet):
@@ -99,15 +192,41 @@ class CustomerViewSet(ModelViewSet):
 
      @action(detail=True, methods=['GET'],permission_classes=[ViewCustomerHistoryPermission])
      def history(self, request, pk):
-          return Response('ok')
+          # served from the maintained summaries, see store.history; only the
+          # requested page of orders is read from the order tables
+          summary = CustomerOrderSummary.objects.filter(customer_id=pk).first()
+          if summary is None:
+               customer = get_object_or_404(Customer.objects.only('id'), pk=pk)
+               summary = CustomerOrderSummary(customer=customer)
+
+          try:
+               top = min(int(request.query_params.get('top', 10)), 50)
+          except ValueError:
+               top = 10
+          top_products = (
+               CustomerProductSummary.objects.filter(customer_id=summary.customer_id)
+               .select_related('product')
+               .order_by('-quantity', 'product_id')[:max(top, 0)]
+          )
+
+          paginator = OrderHistoryPagination()
+          orders = paginator.paginate_queryset(
+               Order.objects.filter(customer_id=summary.customer_id).prefetch_related('order_items__product'),
+               request,
+               view=self,
+          )
+          data = CustomerOrderSummarySerializer(summary).data
+          data['top_products'] = CustomerProductSummarySerializer(top_products, many=True).data
+          data['orders'] = paginator.get_paginated_response(OrderSerializer(orders, many=True).data).data
+          return Response(data)
 
      @action(detail=False, methods=['GET', 'PUT', 'PATCH'] , permission_classes=[IsAuthenticated])
      def me(self, request):
-          customer = Customer.objects.get(user_id=request.user.id)
           if request.method == 'GET':
-               serializer = CustomerSerializer(customer)
+               serializer = CustomerSerializer(get_customer(request))
                return Response(serializer.data)
-          elif request.method == 'PUT':
+          customer = Customer.objects.get(user_id=request.user.id)
+          if request.method == 'PUT':
                serializer = CustomerSerializer(customer, data=request.data)
                serializer.is_valid(raise_exception=True)
                serializer.save()
@@ -128,18 +247,32 @@ class OrderViewSet(ModelViewSet):
 
      http_method_names = ['get','post', 'patch', 'delete', 'head','options']
      def get_permissions(self):
-          if self.request.method in ['PATCH', 'DELETE']:
+          if self.request.method in ['PATCH', 'DELETE'] or self.action == 'export':
                return [IsAdminUser()]
           return [IsAuthenticated()]
      
      def create(self, request, *args, **kwargs):
-          serializer = CreateOrderSerializer(data=request.data, context={'user_id': self.request.user.id})
+          # no get_customer(): orders are priced with the membership, which
+          # the cached copy may not reflect yet
+          serializer = CreateOrderSerializer(data=request.data, context={'user_id': self.request.user.id, 'request': request})
           serializer.is_valid(raise_exception=True)
           order = serializer.save()
           serializer = OrderSerializer(order)
           return Response(serializer.data)
 
+     @action(detail=False, methods=['POST'])
+     def batch(self, request):
+          # no get_customer(): orders are priced with the membership, which
+          # the cached copy may not reflect yet
+          serializer = CreateOrdersSerializer(data=request.data, context={'user_id': self.request.user.id, 'request': request})
+          serializer.is_valid(raise_exception=True)
+          results = serializer.save()
+          created = sum(1 for result in results if 'order_id' in result)
+          return Response({'created': created, 'failed': len(results) - created, 'results': results})
+
      def get_serializer_class(self, *args, **kwargs):
+          if self.action == 'batch':
+               return CreateOrdersSerializer
           if self.request.method == 'POST':
                return CreateOrderSerializer
           elif self.request.method == 'PATCH':
@@ -153,7 +286,34 @@ class OrderViewSet(ModelViewSet):
           }
 
      def get_queryset(self):
+          queryset = Order.objects.prefetch_related('order_items__product')
           if self.request.user.is_staff:
-               return Order.objects.all()
-          customer_id =  Order.objects.only('id') .get(user_id = self.request.user.id)
-          return Order.objects.filter(customer_id = customer_id)
+               return queryset
+          customer = get_customer(self.request)
+          if customer is None:
+               return queryset.none()
+          return queryset.filter(customer_id = customer.id)
+
+     @action(detail=False, methods=['GET'], permission_classes=[IsAdminUser])
+     def export(self, request):
+          # ?output= rather than ?format=, which DRF reserves for renderer selection
+          fmt = request.query_params.get('output', 'ndjson')
+          if fmt not in ('ndjson', 'csv'):
+               return Response({'error': 'output must be ndjson or csv.'}, status=status.HTTP_400_BAD_REQUEST)
+
+          filters = {'payment_status': request.query_params.get('payment_status')}
+          for name, end_of_day in [('placed_after', False), ('placed_before', True)]:
+               value = request.query_params.get(name)
+               if value is None:
+                    continue
+               filters[name] = parse_boundary(value, end_of_day=end_of_day)
+               if filters[name] is None:
+                    return Response({name: 'Enter a valid ISO date or datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+
+          orders = iter_orders(filter_orders(Order.objects.all(), **filters))
+          response = StreamingHttpResponse(
+               order_export_lines(orders, fmt),
+               content_type='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+          )
+          response['Content-Disposition'] = f'attachment; filename="orders.{fmt}"'
+          return response
@@ -1,22 +1,20 @@
 from django.contrib import admin
-from django.db.models.query import QuerySet
-from django.db.models import Count
-from django.http import HttpRequest
+from django.db.models import Sum
 from . import models
 
 # Register your models here.
 @admin.register(models.Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ['title']
+    list_display = ['title', 'tagged_items_count']
     search_fields = ['title']
 
+    def get_queryset(self, request):
+        # summed from the maintained counters (one row per tag and content
+        # type), not counted over TaggedItem
+        return super().get_queryset(request).annotate(
+            tagged_items_count=Sum('counters__count')
+        )
 
-    # def get_queryset(self, request):
-    #     return super().get_queryset(request).annotate(
-    #         tagged_items_count= Count('taggeditems')
-    #     )
-    
-
-    # def tagged_items_count(self, tag: models.Tag):
-    #     return tag.tagged_items_count
-    
\ No newline at end of file
+    @admin.display(ordering='tagged_items_count')
+    def tagged_items_count(self, tag: models.Tag):
+        return tag.tagged_items_count or 0
@@ -0,0 +1,104 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from tags.models import LikeCounter, LikeDelta, TagCounter, TaggedItem
+from tags.signals import like_counts_flushed
+
+
+def adjust_tag_count(tag_id, content_type_id, delta):
+    """Apply a delta to the tag's counter for one content type."""
+    if tag_id is None or content_type_id is None or not delta:
+        return
+    counter, _ = TagCounter.objects.get_or_create(tag_id=tag_id, content_type_id=content_type_id)
+    # clamped at 0 like Collection.products_count, refresh_tag_counts repairs drift
+    TagCounter.objects.filter(pk=counter.pk).update(count=Greatest(F('count') + delta, 0))
+
+
+def refresh_tag_counts(tags):
+    """Recompute the counters of the given tags queryset from TaggedItem."""
+    tag_ids = list(tags.values_list('pk', flat=True))
+    rows = (
+        TaggedItem.objects.filter(tag_id__in=tag_ids)
+        .order_by()
+        .values('tag_id', 'content_type_id')
+        .annotate(total=Count('id'))
+    )
+    TagCounter.objects.filter(tag_id__in=tag_ids).delete()
+    TagCounter.objects.bulk_create([
+        TagCounter(tag_id=row['tag_id'], content_type_id=row['content_type_id'], count=row['total'])
+        for row in rows
+    ])
+    return len(tag_ids)
+
+
+def record_like_delta(content_type_id, object_id, delta):
+    """Stage a like (+1) or unlike (-1); applied later by flush_like_deltas."""
+    LikeDelta.objects.create(content_type_id=content_type_id, object_id=object_id, delta=delta)
+
+
+def flush_like_deltas(batch_size=5000):
+    """
+    Fold one batch of staged deltas into LikeCounter.
+
+    The batch is locked with SKIP LOCKED where the backend supports it, so
+    concurrent flushers take disjoint rows; each counter row is written at
+    most once per batch. Returns the number of deltas applied.
+    """
+    with transaction.atomic():
+        ids = list(
+            LikeDelta.objects.select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        totals = {
+            (row['content_type_id'], row['object_id']): row['total']
+            for row in LikeDelta.objects.filter(pk__in=ids)
+            .values('content_type_id', 'object_id')
+            .annotate(total=Sum('delta'))
+            if row['total']
+        }
+
+        counters = {}
+        for content_type_id in {content_type_id for content_type_id, _ in totals}:
+            object_ids = [object_id for key, object_id in totals if key == content_type_id]
+            for counter in LikeCounter.objects.select_for_update().filter(
+                content_type_id=content_type_id, object_id__in=object_ids,
+            ):
+                counters[(counter.content_type_id, counter.object_id)] = counter
+
+        created = []
+        for (content_type_id, object_id), total in totals.items():
+            counter = counters.get((content_type_id, object_id))
+            if counter is None:
+                created.append(LikeCounter(
+                    content_type_id=content_type_id, object_id=object_id, count=max(total, 0),
+                ))
+            else:
+                counter.count = max(counter.count + total, 0)
+        LikeCounter.objects.bulk_create(created)
+        LikeCounter.objects.bulk_update(counters.values(), ['count'])
+        LikeDelta.objects.filter(pk__in=ids).delete()
+
+        object_ids = {}
+        for content_type_id, object_id in totals:
+            object_ids.setdefault(content_type_id, []).append(object_id)
+        if object_ids:
+            transaction.on_commit(lambda: like_counts_flushed.send(
+                sender=LikeCounter, content_type_ids=set(object_ids), object_ids=object_ids,
+            ))
+    return len(ids)
+
+
+def with_like_counts(queryset):
+    """Annotate `likes_count` from LikeCounter as a correlated subquery."""
+    counts = LikeCounter.objects.filter(
+        content_type=ContentType.objects.get_for_model(queryset.model),
+        object_id=OuterRef('pk'),
+    ).values('count')[:1]
+    return queryset.annotate(
+        likes_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)),
+    )
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tags.counters import flush_like_deltas
+
+
+class Command(BaseCommand):
+    help = 'Fold staged likes and unlikes into the per-object like counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--loop', action='store_true', help='Keep flushing, sleeping --interval between rounds.')
+        parser.add_argument('--interval', type=float, default=10.0, help='Seconds between rounds with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = 0
+            while True:
+                applied = flush_like_deltas(options['batch_size'])
+                flushed += applied
+                if applied < options['batch_size']:
+                    break
+            if flushed or not options['loop']:
+                self.stdout.write(f'Flushed {flushed} like changes.')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
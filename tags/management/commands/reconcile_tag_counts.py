@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from tags.counters import refresh_tag_counts
+from tags.models import Tag
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per content type counters of every tag.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(Tag.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            updated += refresh_tag_counts(Tag.objects.filter(pk__in=pks))
+            last_pk = pks[-1]
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {updated} tags.'))
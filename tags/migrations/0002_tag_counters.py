@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_tag_counters(apps, schema_editor):
+    TaggedItem = apps.get_model('tags', 'TaggedItem')
+    TagCounter = apps.get_model('tags', 'TagCounter')
+
+    rows = TaggedItem.objects.order_by().values('tag_id', 'content_type_id').annotate(total=Count('id'))
+    TagCounter.objects.bulk_create(
+        (
+            TagCounter(tag_id=row['tag_id'], content_type_id=row['content_type_id'], count=row['total'])
+            for row in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='taggeditem',
+            index=models.Index(fields=['content_type', 'object_id', 'tag'], name='taggeditem_object_tag_idx'),
+        ),
+        migrations.AddField(
+            model_name='tagcounter',
+            name='content_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype'),
+        ),
+        migrations.AddField(
+            model_name='tagcounter',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='tags.tag'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tagcounter',
+            unique_together={('tag', 'content_type')},
+        ),
+        migrations.RunPython(backfill_tag_counters, migrations.RunPython.noop),
+    ]
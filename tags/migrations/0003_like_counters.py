@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    LikedItem = apps.get_model('tags', 'LikedItem')
+
+    duplicates = (
+        LikedItem.objects.order_by()
+        .values('user_id', 'content_type_id', 'object_id')
+        .annotate(first=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        LikedItem.objects.filter(
+            user_id=row['user_id'], content_type_id=row['content_type_id'], object_id=row['object_id'],
+        ).exclude(pk=row['first']).delete()
+
+
+def backfill_like_counters(apps, schema_editor):
+    LikedItem = apps.get_model('tags', 'LikedItem')
+    LikeCounter = apps.get_model('tags', 'LikeCounter')
+
+    rows = LikedItem.objects.order_by().values('content_type_id', 'object_id').annotate(total=Count('id'))
+    LikeCounter.objects.bulk_create(
+        (
+            LikeCounter(content_type_id=row['content_type_id'], object_id=row['object_id'], count=row['total'])
+            for row in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tags', '0002_tag_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LikeDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('delta', models.SmallIntegerField()),
+            ],
+        ),
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='likeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'content_type', 'object_id'), name='likeditem_unique_user_object'),
+        ),
+        migrations.AddField(
+            model_name='likecounter',
+            name='content_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype'),
+        ),
+        migrations.AddField(
+            model_name='likedelta',
+            name='content_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='likecounter',
+            unique_together={('content_type', 'object_id')},
+        ),
+        migrations.RunPython(backfill_like_counters, migrations.RunPython.noop),
+    ]
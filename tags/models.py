@@ -19,9 +19,50 @@ class TaggedItem(models.Model):
     # what the object is
     content_object = GenericForeignKey('content_type', 'object_id')
 
+    class Meta:
+        indexes = [
+            # "is this object tagged with ..." lookups and per-object tag scans
+            models.Index(fields=['content_type', 'object_id', 'tag'], name='taggeditem_object_tag_idx'),
+        ]
+
+
+class TagCounter(models.Model):
+    # number of objects of one content type carrying the tag,
+    # maintained by the TaggedItem signal handlers, see tags.counters
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='counters')
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['tag', 'content_type']
+
+
 class LikedItem(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'content_type', 'object_id'], name='likeditem_unique_user_object'),
+        ]
+
+
+class LikeDelta(models.Model):
+    # append-only staging rows written on like/unlike and folded into
+    # LikeCounter in batches by flush_like_counters, so popular objects
+    # never serialize their likers on one counter row
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.PositiveIntegerField()
+    delta = models.SmallIntegerField()
+
+
+class LikeCounter(models.Model):
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['content_type', 'object_id']
     
\ No newline at end of file
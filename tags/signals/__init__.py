@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# sent after flush_like_deltas folded staged likes into LikeCounter, with
+# content_type_ids of the counters that changed and object_ids, a
+# {content_type_id: [object_id, ...]} dict of the changed objects
+like_counts_flushed = Signal()
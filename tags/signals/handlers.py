@@ -0,0 +1,45 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from tags.counters import adjust_tag_count, record_like_delta
+from tags.models import LikedItem, TaggedItem
+
+
+_UNKNOWN = object()
+
+
+@receiver(post_init, sender=TaggedItem)
+def remember_tagged_item_key(sender, instance, **kwargs):
+    # read from __dict__ so deferred loads (.only()) don't trigger a query
+    instance._loaded_tag_key = (
+        instance.__dict__.get('tag_id', _UNKNOWN),
+        instance.__dict__.get('content_type_id', _UNKNOWN),
+    )
+
+
+@receiver(post_save, sender=TaggedItem)
+def update_tag_counter(sender, instance, created, **kwargs):
+    current = (instance.tag_id, instance.content_type_id)
+    previous = getattr(instance, '_loaded_tag_key', (_UNKNOWN, _UNKNOWN))
+    if created:
+        adjust_tag_count(*current, 1)
+    elif _UNKNOWN not in previous and previous != current:
+        adjust_tag_count(*previous, -1)
+        adjust_tag_count(*current, 1)
+    instance._loaded_tag_key = current
+
+
+@receiver(post_delete, sender=TaggedItem)
+def decrement_tag_counter(sender, instance, **kwargs):
+    adjust_tag_count(instance.tag_id, instance.content_type_id, -1)
+
+
+@receiver(post_save, sender=LikedItem)
+def stage_like(sender, instance, created, **kwargs):
+    if created:
+        record_like_delta(instance.content_type_id, instance.object_id, 1)
+
+
+@receiver(post_delete, sender=LikedItem)
+def stage_unlike(sender, instance, **kwargs):
+    record_like_delta(instance.content_type_id, instance.object_id, -1)